@@ -0,0 +1,176 @@
+"""
+Module for caching the columns parsed by :func:`readcol` as binary
+sidecar files, so that repeated reads of the same text file can
+memory-map the cached arrays instead of re-parsing.
+
+Each cached read is a directory holding one '.npy' file per column plus
+the header, named for a hash of the file's path, size and modification
+time and the options it was parsed with. Editing the file therefore
+invalidates its entries. When the cache grows past 'CACHE_MAXSIZE' bytes
+the least recently used entries are removed.
+
+Author:
+
+    C.M. Gosmeyer
+
+
+"""
+
+from __future__ import print_function
+import hashlib
+import numpy as np
+import os
+import shutil
+import tempfile
+
+
+# Defaults, which can be changed here or with environment variables.
+CACHE_DIR = os.environ.get('ANALYSIS_TOOLS_CACHE',
+    os.path.join(os.path.expanduser('~'), '.analysis_tools', 'readcol_cache'))
+CACHE_MAXSIZE = int(os.environ.get('ANALYSIS_TOOLS_CACHE_MAXSIZE', 2**30))
+
+
+#-----------------------------------------------------------------------------#
+
+def cache_key(filename, **options):
+    """ Returns the key of a file parsed with the given options.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the parsed file.
+    options :
+        The parsing options, any values with a stable repr.
+
+    Returns
+    -------
+    key : str
+        Hex digest that changes if the file or any option changes.
+    """
+    stat = os.stat(filename)
+    items = [os.path.abspath(filename), stat.st_size, stat.st_mtime]
+    for name in sorted(options):
+        value = options[name]
+        if isinstance(value, dict):
+            value = sorted(value.items(), key=repr)
+        items.append((name, value))
+
+    return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()
+
+
+#-----------------------------------------------------------------------------#
+
+def load(key, cache_dir=None):
+    """ Loads a cache entry, memory-mapping its columns.
+
+    Parameters
+    ----------
+    key : str
+        As returned by :func:`cache_key`.
+    cache_dir : str
+        Location of the cache. 'CACHE_DIR' by default.
+
+    Returns
+    -------
+    header : list of strings
+        The column names, or None if there is no entry for 'key'.
+    cols : list of arrays
+        The memory-mapped columns, or None if there is no entry for 'key'.
+    """
+    entry = os.path.join(cache_dir or CACHE_DIR, key)
+    try:
+        header = np.load(os.path.join(entry, 'header.npy')).tolist()
+        cols = [np.load(os.path.join(entry, 'col{}.npy'.format(j)),
+            mmap_mode='r') for j in range(len(header))]
+    except IOError:
+        return None, None
+
+    # Mark as recently used, for eviction.
+    os.utime(entry, None)
+
+    return header, cols
+
+
+#-----------------------------------------------------------------------------#
+
+def store(key, header, cols, cache_dir=None, maxsize=None):
+    """ Saves columns to the cache, then evicts old entries if the cache
+    is over its size limit.
+
+    Parameters
+    ----------
+    key : str
+        As returned by :func:`cache_key`.
+    header : list of strings
+        The column names.
+    cols : list of lists or arrays
+        The columns. Lists are saved as arrays.
+    cache_dir : str
+        Location of the cache. 'CACHE_DIR' by default.
+    maxsize : int
+        Size limit of the cache in bytes. 'CACHE_MAXSIZE' by default.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    # Write into a temporary directory and rename it into place, so that
+    # a reader never sees a half-written entry.
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix='.tmp')
+    np.save(os.path.join(tmp, 'header.npy'), np.array(header, dtype=str))
+    for j, col in enumerate(cols):
+        np.save(os.path.join(tmp, 'col{}.npy'.format(j)), np.asarray(col))
+    try:
+        os.rename(tmp, os.path.join(cache_dir, key))
+    except OSError:
+        # Another process stored the same entry first.
+        shutil.rmtree(tmp)
+
+    evict(cache_dir, maxsize)
+
+
+#-----------------------------------------------------------------------------#
+
+def evict(cache_dir=None, maxsize=None):
+    """ Removes least recently used entries until the cache is no larger
+    than 'maxsize'.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Location of the cache. 'CACHE_DIR' by default.
+    maxsize : int
+        Size limit of the cache in bytes. 'CACHE_MAXSIZE' by default.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    if maxsize is None:
+        maxsize = CACHE_MAXSIZE
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if name.startswith('.tmp') or not os.path.isdir(entry):
+            continue
+        size = sum(os.path.getsize(os.path.join(entry, item))
+            for item in os.listdir(entry))
+        entries.append((os.path.getmtime(entry), size, entry))
+
+    total = sum(size for mtime, size, entry in entries)
+    for mtime, size, entry in sorted(entries):
+        if total <= maxsize:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+#-----------------------------------------------------------------------------#
+
+def clear(cache_dir=None):
+    """ Removes every entry of the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Location of the cache. 'CACHE_DIR' by default.
+    """
+    evict(cache_dir, maxsize=0)
@@ -10,23 +10,56 @@ Author:
 
 from __future__ import print_function
 from __future__ import with_statement
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import bz2
+import gzip
+import lzma
 import numpy as np
+import operator
 import os
 import re
 import sys
+import zlib
+
+from analysis_tools.io import colcache
+from analysis_tools.tables.columntable import ColumnTable
+
+
+# The tests 'where' can make on a column, as in where.andwhere.
+_TESTS = {'<': operator.lt, '>': operator.gt, '<=': operator.le, 
+    '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+
+# Leading bytes of compressed files, and how to open them.
+_COMPRESSION = [(b'\x1f\x8b', gzip.open), (b'BZh', bz2.open), 
+    (b'\xfd7zXZ\x00', lzma.open)]
+
+# Leading bytes of the binary tables written by writecol.
+_BINARY = [(b'\x93NUMPY', 'npy'), (b'SIMPLE  ', 'fits')]
+
+# Raised while reading a corrupt or truncated compressed file, besides
+# the IOErrors of gzip and bz2.
+_DECOMPRESSION_ERRORS = (EOFError, lzma.LZMAError, zlib.error)
 
 
 #-----------------------------------------------------------------------------#
 
 def readcol(filename, headerstart=0, datastart=1, comment=' ', 
-    delimiter="\s+"):
+    delimiter=r"\s+", engine='python', dtype=None, cache=False, 
+    cache_dir=None, verbose=True, usecols=None, where=None, 
+    return_type=list):
     """ Reads the columns of a text file. Returns the columns as a 
     list of list and the header as a list.
 
     Parameters
     ----------
     filename : str
-        Name of the text file.
+        Name of the text file. Files compressed with gzip, bzip2 or xz
+        are decompressed as they are read; a corrupt or cut-off one is
+        reported like a missing file. The 'npy' and 'fits' binary 
+        tables of :func:`writecol` are memory-mapped instead, and their 
+        columns returned as arrays whatever the engine.
     headerstart : int 
         The row of the header. By default, row=0.
     datastart : int 
@@ -36,6 +69,43 @@ def readcol(filename, headerstart=0, datastart=1, comment=' ',
          columns. By default nothing. 
     delimiter : str
          The column divider. By default, spaces or tabs. 
+    engine : {'python', 'numpy'}
+         How to build the columns. 'python' returns lists of strings.
+         'numpy' splits the data rows in blocks and returns typed NumPy
+         arrays, which is much faster and smaller for large files. It 
+         needs every row to fill the header, so a file with short rows,
+         or with entries that do not convert to 'dtype', is reported and
+         no columns are returned.
+    dtype : type, dict, or None
+         Only used by the 'numpy' engine. If None, each column is 
+         converted to int, else float, else left as strings. A single 
+         type is applied to every column. A dict maps column names (or 
+         column indices) to types; unlisted columns are inferred.
+    cache : {True, False}
+         Set to True to save the parsed columns as binary files (see 
+         :mod:`analysis_tools.io.colcache`) and, on later calls with the 
+         same file and options, memory-map them instead of parsing.
+    cache_dir : str
+         Location of the cache. By default, colcache.CACHE_DIR.
+    verbose : {True, False}
+         Print messages to screen? 
+    usecols : list
+         Names or indices of the columns to return, in that order. 
+         Other columns are dropped as each row is read. By default, all.
+    where : dict
+         Maps column names (or indices) to a test, e.g., 
+         {'mag': ('<', 22)}, or to a list of tests, e.g., 
+         {'mag': [('>', 18), ('<', 22)]}. Tests are '<', '>', '<=', 
+         '>=', '==' or '!='. Only rows passing every test are kept; 
+         entries are compared as floats unless the test value is a str,
+         and entries that are not numbers, e.g., 'INDEF', fail. With 
+         usecols or where, rows too short to hold the columns are skipped.
+    return_type : {list, ColumnTable}
+         Type to return. If 'list', the header and columns as below. If
+         :class:`analysis_tools.tables.columntable.ColumnTable`, a 
+         ColumnTable of the columns as arrays, named by the header. As 
+         with engine='numpy', a file with short rows is then reported 
+         and an empty ColumnTable returned.
 
     Returns
     -------
@@ -45,94 +115,772 @@ def readcol(filename, headerstart=0, datastart=1, comment=' ',
         be removed. If no column names exist, then returns a list 
         of string numbers, starting at '0'. 
     cols : list of lists
-        List of the columns, each their own list. If no columns found,
-        returns an empty list. 
+        List of the columns, each their own list (or array, if 
+        engine='numpy'). If no columns found, returns an empty list. 
 
     future improvements:
     - option to return a dictionary??
 
     """
 
+    header, cols, error = _readcol(filename, headerstart, datastart, 
+        comment, delimiter, engine, dtype, cache, cache_dir, verbose, 
+        usecols, where)
+    if error is None and return_type is ColumnTable:
+        error = _uneven_error(filename, header, cols)
+    if error is not None:
+        if verbose:
+            print(error)
+        return _returned([], [], return_type)
+
+    return _returned(header, cols, return_type)
+
+
+#-----------------------------------------------------------------------------#
+
+def _readcol(filename, headerstart=0, datastart=1, comment=' ', 
+    delimiter=r"\s+", engine='python', dtype=None, cache=False, 
+    cache_dir=None, verbose=True, usecols=None, where=None):
+    """ Does the reading for :func:`readcol`, whose parameters it takes.
+    Rather than printing why a file could not be read, returns it, so 
+    that :func:`readcol_many` can report it too.
+
+    Returns
+    -------
+    header : list of strings
+        The column names, or [] if the file failed.
+    cols : list of lists or arrays
+        The columns, or [] if the file failed.
+    error : str
+        Why the file failed, or None.
+    """
     # Try and Except to exit gracefully and return empty lists
     # if the file does not exist.
-    # (but if end up not returning empty lists, could try to 
-    # re-write the with loop into the try-with)
     try: 
+        # Binary tables need no parsing.
+        binary = _binary_format(filename)
+        if binary is not None:
+            if verbose:
+                print("reading {}".format(filename))
+            header, cols = _read_binary(filename, binary, usecols, where)
+            if header == []:
+                return [], [], "No binary table found in file {}."\
+                    .format(filename)
+            return header, cols, None
+
+        # Use the cached columns if this file was already parsed
+        # with these options.
+        if cache:
+            key = colcache.cache_key(filename, headerstart=headerstart, 
+                datastart=datastart, comment=comment, delimiter=delimiter, 
+                engine=engine, dtype=dtype, usecols=usecols, where=where)
+            header, cols = colcache.load(key, cache_dir)
+            if header is not None:
+                if verbose:
+                    print("reading {} from cache".format(filename))
+                if engine != 'numpy':
+                    cols = [col.tolist() for col in cols]
+                return header, cols, None
+
         # Open using with so that if error occurs the file will
         # be closed properly.
-        with open(filename, 'r') as f:
-            print("reading {}".format(filename))
+        with _open(filename) as f:
+            if verbose:
+                print("reading {}".format(filename))
 
-            # Initialize counts and lists.
+            # Initialize lists.
+            header = []
             cols = []
-            row_count = 0
-
-            # Make sure that \t, \n, etc will still be split out.
-            if delimiter != "\s+":
-                delimiter = '[' + delimiter + '\s\+]'
-
-            # not too happy with the with then for structure
-            # but better to use with so that file always is closed.
-            # how to return custom output if exception occurs? 
-            for line in f:
-
-                # Change line into list of entires, split by the 
-                # delimiter.
-                linestrip = re.split(delimiter, line)
-
-                # Remove all empty strings.
-                while '' in linestrip:
-                    linestrip.remove('')
-
-                # First test that line is not empty.
-                # Second test whether the first line is in fact
-                # a custom comment.
-                # If the user chooses to have a comment above the header,
-                # and that header is denoted by the same comment marker,
-                # it is on the user to choose correctly the 'headerstart'.
-                if linestrip != [] and linestrip[0][0] != comment:
-
-                    # If there is a header, retrieve the column names.
-                    if row_count == headerstart and headerstart != datastart:
-                        # Figure out how many columns and their names.
-                        if linestrip[0] == '#':
-                            ncols = len(linestrip)-1
-                            linestrip.remove('#')
-                        else:
-                            ncols = len(linestrip)
-                        print('ncols: {}'.format(ncols))
-                        header = linestrip
-                        # Initilize empty list for each column.
-                        cols = [[] for row in range(ncols)]
-
-                        # Remove comment if first character.
-                        if header[0][0] == '#':
-                            header[0] = header[0][1:]
-
-                    # If there is no header, just name the columns
-                    # by number.
-                    elif row_count == datastart and datastart == headerstart:
-                        ncols = len(linestrip)
-                        header = list(map(str, np.arange(ncols)))
-                        # Initilize empty list for each column.
-                        cols = [[] for row in range(ncols)]
-
-                    # For all rows not in header, not empty, and not 
-                    # a comment, append to column list.
-                    # This is an if so that it can execute should
-                    # headerstart = datastart = 0.
-                    if row_count >= datastart and linestrip != []:
-                        for item, row in zip(linestrip, range(ncols)):
-                            cols[row].append(item)
-                    row_count+=1
-
-        # Check whether the file was empty or no valid columns read.
-        if cols == []:
-            print("No valid columns found for file {}.".format(filename))
-            return [], []
+
+            rows = _scan_rows(f, headerstart, datastart, comment, 
+                _splitter(delimiter))
+
+            # The first item out of the scanner is the header.
+            header = next(rows, [])
+            if header != []:
+                header, rows = _select(header, rows, usecols, where)
+            ncols = len(header)
+            if header != []:
+                if verbose:
+                    print('ncols: {}'.format(ncols))
+
+                if engine == 'numpy':
+                    try:
+                        cols = _numpy_columns(rows, header, dtype)
+                    except ValueError as e:
+                        # Rows short of the header, or entries not of
+                        # 'dtype', cannot make columns.
+                        return [], [], "Could not read columns of {}: {}"\
+                            .format(filename, e)
+                else:
+                    # Initilize empty list for each column.
+                    cols = [[] for row in range(ncols)]
+                    for linestrip in rows:
+                        for item, col in zip(linestrip, cols):
+                            col.append(item)
+
+    except (IOError,) + _DECOMPRESSION_ERRORS as e:
+        return [], [], _read_error(filename, e)
+
+    # Check whether the file was empty or no valid columns read.
+    if cols == []:
+        return [], [], "No valid columns found for file {}.".format(filename)
+
+    if cache:
+        try:
+            colcache.store(key, header, cols, cache_dir)
+        except (IOError, OSError):
+            if verbose:
+                print("Could not cache columns of {}.".format(filename))
+
+    return header, cols, None
+
+
+#-----------------------------------------------------------------------------#
+
+def _read_error(filename, e):
+    """ Returns the message reporting why 'filename' could not be read: 
+    it does not exist, or it is corrupt or cut short.
+    """
+    if isinstance(e, _DECOMPRESSION_ERRORS):
+        return "Could not decompress file {}: {}".format(filename, e)
+    if not os.path.isfile(filename):
+        return "File {} does not exist.".format(filename)
+    return "Could not read file {}: {}".format(filename, e)
+
+
+#-----------------------------------------------------------------------------#
+
+def _uneven_error(filename, header, cols):
+    """ Returns why the columns cannot make a ColumnTable if, as the 
+    'python' engine leaves them after short rows, they are not all the 
+    same length; else None.
+    """
+    if len(set(len(col) for col in cols)) > 1:
+        return "Could not read columns of {}: some rows have fewer than "\
+            "{} columns.".format(filename, len(header))
+    return None
+
+
+#-----------------------------------------------------------------------------#
+
+def _returned(header, cols, return_type):
+    """ Packs the output of :func:`readcol` as its 'return_type' asks.
+    """
+    if return_type is ColumnTable:
+        return ColumnTable(cols, names=header)
+    return header, cols
+
+
+#-----------------------------------------------------------------------------#
+
+def readcol_iter(filename, chunksize=100000, headerstart=0, datastart=1, 
+    comment=' ', delimiter=r"\s+", dtype=None, usecols=None, where=None):
+    """ Reads the columns of a text file in chunks, so that files larger 
+    than memory can be streamed. Uses the same header and comment rules 
+    as :func:`readcol` with engine='numpy', except that a row shorter 
+    than the header raises ValueError, since earlier chunks are already 
+    out. A corrupt or cut-off compressed file is reported, and ends the
+    chunks.
+
+    Use
+    ---
+        for header, cols in readcol_iter('big_catalog.txt', 500000):
+            process(cols)
+
+    Parameters
+    ----------
+    filename : str
+        Name of the text file. May be compressed, as in :func:`readcol`.
+    chunksize : int
+        Number of rows in each chunk. Only the last chunk may be shorter.
+    headerstart : int 
+        The row of the header. By default, row=0.
+    datastart : int 
+         The row the data begins. By default, row=1
+    comment : str
+         The character denoting a comment line, to be ignored when reading
+         columns. By default nothing. 
+    delimiter : str
+         The column divider. By default, spaces or tabs. 
+    dtype : type, dict, or None
+         See :func:`readcol`. Inferred types are decided chunk by chunk,
+         so give 'dtype' if every chunk must have the same types.
+    usecols : list
+         See :func:`readcol`.
+    where : dict
+         See :func:`readcol`.
+
+    Yields
+    ------
+    header : list of strings
+        The column names, as in :func:`readcol`.
+    cols : list of arrays
+        The next 'chunksize' rows of each column.
+    """
+    try:
+        f = _open(filename)
+    except IOError as e:
+        print(_read_error(filename, e))
+        return
+
+    with f:
+        rows = _scan_rows(f, headerstart, datastart, comment, 
+            _splitter(delimiter))
+        try:
+            header = next(rows, [])
+            if header == []:
+                print("No valid columns found for file {}.".format(filename))
+                return
+            header, rows = _select(header, rows, usecols, where)
+
+            dtypes = [_column_dtype(header, j, dtype) 
+                for j in range(len(header))]
+            for block in _block_rows(rows, len(header), chunksize):
+                cols = [_convert(block[:, j], dtypes[j]) 
+                    for j in range(len(header))]
+                yield header, cols
+        except (IOError,) + _DECOMPRESSION_ERRORS as e:
+            # The chunks before the damage are already out.
+            print(_read_error(filename, e))
+
+
+#-----------------------------------------------------------------------------#
+
+def readcol_many(filenames, workers=None, concatenate=False, **kwargs):
+    """ Reads the columns of many text files in parallel, one file per
+    process. Files that cannot be read are reported rather than skipped
+    silently.
+
+    Use
+    ---
+        results, errors = readcol_many(glob.glob('*_phot.txt'), workers=8)
+
+    Parameters
+    ----------
+    filenames : list of str
+        Names of the text files.
+    workers : int
+        Number of processes. By default, the number of CPUs. If 1, the 
+        files are read one after the other in this process.
+    concatenate : {True, False}
+        Set to True to join the columns of all files into one set of 
+        columns, with an extra 'source' column naming the file of each 
+        row. Files must share a header, and with engine='numpy' the 
+        kinds of their column types (int, float, str), to be joined.
+    kwargs : 
+        Passed to :func:`readcol`, e.g., 'headerstart' or 'engine'. If
+        'return_type' is ColumnTable, each result (or the joined result)
+        is a ColumnTable rather than a (header, cols) pair.
+
+    Returns
+    -------
+    If 'concatenate' is False,
+    results : list of tuples
+        The (header, cols) of each file, in the order of 'filenames'.
+        Files that failed give ([], []).
+    errors : OrderedDict
+        Maps the name of each file that failed to its error message.
+    If 'concatenate' is True,
+    header : list of strings
+        The shared column names, plus 'source'.
+    cols : list of lists or arrays
+        The joined columns, the last of them being 'source'.
+    errors : OrderedDict
+        As above, also listing files whose header or column types did
+        not match.
+    """
+    return_type = kwargs.pop('return_type', list)
+    tasks = [(filename, kwargs) for filename in filenames]
+    if workers == 1:
+        outputs = list(map(_readcol_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outputs = list(executor.map(_readcol_task, tasks))
+
+    results = []
+    errors = OrderedDict()
+    for filename, (header, cols, error) in zip(filenames, outputs):
+        if error is None and return_type is ColumnTable:
+            error = _uneven_error(filename, header, cols)
+        if error is not None:
+            errors[filename] = error
+            header, cols = [], []
+        results.append((header, cols))
+
+    if not concatenate:
+        if return_type is ColumnTable:
+            results = [ColumnTable(cols, names=header) 
+                for header, cols in results]
+        return results, errors
+
+    # Join the files that share the header, and with engine='numpy' the
+    # kinds of column types, of the first good file.
+    numpy_engine = kwargs.get('engine') == 'numpy'
+    header = []
+    kinds = []
+    joined = []
+    for filename, (file_header, cols) in zip(filenames, results):
+        if filename in errors:
+            continue
+        file_kinds = [col.dtype.kind for col in cols] if numpy_engine else []
+        if header == []:
+            header = file_header
+            kinds = file_kinds
+        elif file_header != header:
+            errors[filename] = "Header {} does not match {}."\
+                .format(file_header, header)
+            continue
+        elif file_kinds != kinds:
+            errors[filename] = "Column types {} do not match {}."\
+                .format(file_kinds, kinds)
+            continue
+        joined.append((filename, cols))
+
+    if joined == []:
+        if return_type is ColumnTable:
+            return ColumnTable([]), errors
+        return [], [], errors
+
+    cols = []
+    lengths = [len(file_cols[0]) for filename, file_cols in joined]
+    if numpy_engine:
+        for j in range(len(header)):
+            cols.append(np.concatenate([file_cols[j] 
+                for filename, file_cols in joined]))
+        cols.append(np.repeat(np.array([filename 
+            for filename, file_cols in joined]), lengths))
+    else:
+        for j in range(len(header)):
+            cols.append([item for filename, file_cols in joined 
+                for item in file_cols[j]])
+        cols.append([filename for (filename, file_cols), length 
+            in zip(joined, lengths) for i in range(length)])
+
+    if return_type is ColumnTable:
+        return ColumnTable(cols, names=header + ['source']), errors
+    return header + ['source'], cols, errors
+
+
+#-----------------------------------------------------------------------------#
+
+def _readcol_task(task):
+    """ Reads one file for :func:`readcol_many`. Catches the failures of
+    :func:`readcol` so they can be reported per file.
+
+    Parameters
+    ----------
+    task : tuple
+        The file name and the keyword arguments for :func:`readcol`.
+
+    Returns
+    -------
+    header : list of strings
+        The column names, or [] if the file failed.
+    cols : list of lists or arrays
+        The columns, or [] if the file failed.
+    error : str
+        Why the file failed, or None.
+    """
+    filename, kwargs = task
+    kwargs = dict(kwargs, verbose=False)
+    try:
+        return _readcol(filename, **kwargs)
+    except Exception as e:
+        return [], [], "{}: {}".format(type(e).__name__, e)
+
+
+#-----------------------------------------------------------------------------#
+
+def _open(filename):
+    """ Opens a text file for reading. Files compressed with gzip, bzip2
+    or xz, told apart by their leading bytes, are decompressed as they 
+    are read rather than to disk.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the text file.
+
+    Returns
+    -------
+    f : file
+        The open file, in text mode.
+    """
+    magic = _magic(filename)
+    for prefix, opener in _COMPRESSION:
+        if magic.startswith(prefix):
+            return opener(filename, 'rt')
+
+    return open(filename, 'r')
+
+
+#-----------------------------------------------------------------------------#
+
+def _magic(filename):
+    """ Returns the first bytes of a file, to tell its format.
+    """
+    with open(filename, 'rb') as f:
+        return f.read(8)
+
+
+#-----------------------------------------------------------------------------#
+
+def _binary_format(filename):
+    """ Returns 'npy' or 'fits' if the file is one of the binary tables
+    written by :func:`writecol`, else None.
+    """
+    magic = _magic(filename)
+    for prefix, kind in _BINARY:
+        if magic.startswith(prefix):
+            return kind
+
+    return None
+
+
+#-----------------------------------------------------------------------------#
+
+def _read_binary(filename, kind, usecols=None, where=None):
+    """ Loads the columns of a binary table memory-mapped, so that no 
+    column is copied unless 'where' drops rows.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the binary file.
+    kind : {'npy', 'fits'}
+        As returned by :func:`_binary_format`.
+    usecols : list
+        See :func:`readcol`.
+    where : dict
+        See :func:`readcol`.
+
+    Returns
+    -------
+    header : list of strings
+        The column names.
+    cols : list of arrays
+        The columns. Both are empty if a FITS file holds no binary table
+        in its first extension, e.g., if it is an image.
+    """
+    if kind == 'npy':
+        table = np.load(filename, mmap_mode='r')
+    else:
+        from astropy.io import fits
+        with fits.open(filename, memmap=True) as hdulist:
+            if len(hdulist) < 2 or \
+                not isinstance(hdulist[1], fits.BinTableHDU):
+                return [], []
+        table = fits.getdata(filename, ext=1, memmap=True)
+
+    header = list(table.dtype.names)
+    if usecols is not None:
+        header = [header[_column_index(header, col)] for col in usecols]
+    cols = [table[name] for name in header]
+
+    if where is not None:
+        names = list(table.dtype.names)
+        keep = np.ones(len(table), dtype=bool)
+        for col, spec in where.items():
+            data = table[names[_column_index(names, col)]]
+            if isinstance(spec, tuple):
+                spec = [spec]
+            for test, val in spec:
+                if test not in _TESTS:
+                    raise ValueError("Invalid equality check, {}".format(test))
+                keep &= _TESTS[test](data, val)
+        cols = [col[keep] for col in cols]
+
+    return header, cols
+
+
+#-----------------------------------------------------------------------------#
+
+def _splitter(delimiter):
+    """ Returns a function that splits a line into its non-empty entries.
+
+    Parameters
+    ----------
+    delimiter : str
+        The column divider, as passed to :func:`readcol`.
+
+    Returns
+    -------
+    split : function
+        Takes a line and returns a list of its entries.
+    """
+    # Whitespace is what str.split does natively, and much faster.
+    if delimiter == r"\s+":
+        return str.split
+
+    # Make sure that \t, \n, etc will still be split out.
+    regex = re.compile('[' + delimiter + r'\s\+]')
+
+    def split(line):
+        return [item for item in regex.split(line) if item != '']
+
+    return split
+
+
+#-----------------------------------------------------------------------------#
+
+def _scan_rows(f, headerstart, datastart, comment, split):
+    """ Generator walking the lines of an open file with the header and 
+    comment rules of :func:`readcol`. The header is yielded first, then 
+    the entries of each data row.
+
+    Parameters
+    ----------
+    f : file
+        The open text file.
+    headerstart : int 
+        The row of the header.
+    datastart : int 
+         The row the data begins.
+    comment : str
+         The character denoting a comment line.
+    split : function
+         Splits a line into its entries. See :func:`_splitter`.
+
+    Yields
+    ------
+    header : list of strings
+        The column names, once found. 
+    linestrip : list of strings
+        The entries of each data row.
+    """
+    row_count = 0
+
+    for line in f:
+
+        # Change line into list of entries, split by the delimiter.
+        linestrip = split(line)
+
+        # First test that line is not empty.
+        # Second test whether the first line is in fact
+        # a custom comment.
+        # If the user chooses to have a comment above the header,
+        # and that header is denoted by the same comment marker,
+        # it is on the user to choose correctly the 'headerstart'.
+        if linestrip != [] and linestrip[0][0] != comment:
+
+            # If there is a header, retrieve the column names.
+            if row_count == headerstart and headerstart != datastart:
+                if linestrip[0] == '#':
+                    linestrip.remove('#')
+                header = linestrip
+
+                # Remove comment if first character.
+                if header[0][0] == '#':
+                    header[0] = header[0][1:]
+                yield header
+
+            # If there is no header, just name the columns
+            # by number.
+            elif row_count == datastart and datastart == headerstart:
+                yield list(map(str, np.arange(len(linestrip))))
+
+            # For all rows not in header, not empty, and not 
+            # a comment, yield the entries.
+            # This is an if so that it can execute should
+            # headerstart = datastart = 0.
+            if row_count >= datastart:
+                yield linestrip
+            row_count+=1
+
+
+#-----------------------------------------------------------------------------#
+
+def _select(header, rows, usecols=None, where=None):
+    """ Applies the column selection and row tests of :func:`readcol` to
+    the data rows as they are read.
+
+    Parameters
+    ----------
+    header : list of strings
+        The column names of the file.
+    rows : iterator
+        Lists of the entries of each data row.
+    usecols : list
+        Names or indices of the columns to keep. By default, all.
+    where : dict
+        Maps column names or indices to a test or list of tests.
+
+    Returns
+    -------
+    header : list of strings
+        The names of the kept columns.
+    rows : iterator
+        Lists of the kept entries of each row passing the tests.
+    """
+    if usecols is None and where is None:
+        return header, rows
+
+    if usecols is None:
+        index = list(range(len(header)))
+    else:
+        index = [_column_index(header, col) for col in usecols]
+
+    tests = []
+    for col, spec in (where or {}).items():
+        j = _column_index(header, col)
+        if isinstance(spec, tuple):
+            spec = [spec]
+        for test, val in spec:
+            if test not in _TESTS:
+                raise ValueError("Invalid equality check, {}".format(test))
+            tests.append((j, _TESTS[test], val, isinstance(val, str)))
+
+    return [header[j] for j in index], _filter_rows(rows, index, tests)
+
+
+#-----------------------------------------------------------------------------#
+
+def _filter_rows(rows, index, tests):
+    """ Generator keeping only the rows that pass every test, and only 
+    the entries at 'index' of those rows. See :func:`_select`. Rows too
+    short to hold every kept and tested column are skipped, as are rows
+    whose tested entries are not numbers, e.g., '--' or 'INDEF'.
+    """
+    width = max(index + [j for j, test, val, is_str in tests] + [-1]) + 1
+    for linestrip in rows:
+        if len(linestrip) < width:
+            continue
+        try:
+            passed = all(test(linestrip[j] if is_str else float(linestrip[j]),
+                val) for j, test, val, is_str in tests)
+        except ValueError:
+            passed = False
+        if passed:
+            yield [linestrip[j] for j in index]
+
+
+#-----------------------------------------------------------------------------#
+
+def _column_index(header, col):
+    """ Returns the index of a column given by name or index.
+    """
+    if col in header:
+        return header.index(col)
+    if isinstance(col, (int, np.integer)) and -len(header) <= col < len(header):
+        return col % len(header)
+    raise ValueError("No column {} in {}.".format(col, header))
+
+
+#-----------------------------------------------------------------------------#
+
+def _numpy_columns(rows, header, dtype=None, blocksize=65536):
+    """ Builds typed arrays from the data rows coming out of 
+    :func:`_scan_rows`, converting a block of rows at a time.
+
+    Parameters
+    ----------
+    rows : iterator
+        Lists of the entries of each data row.
+    header : list of strings
+        The column names.
+    dtype : type, dict, or None
+        See :func:`readcol`.
+    blocksize : int
+        Number of rows split into an array at once.
+
+    Returns
+    -------
+    cols : list of arrays
+        One array for each column.
+    """
+    ncols = len(header)
+    dtypes = [_column_dtype(header, j, dtype) for j in range(ncols)]
+    blocks = [[] for j in range(ncols)]
+
+    for block in _block_rows(rows, ncols, blocksize):
+        for j in range(ncols):
+            # Columns with a known type are converted right away, so 
+            # only the inferred columns are held as strings.
+            if dtypes[j] is None:
+                blocks[j].append(block[:, j])
+            else:
+                blocks[j].append(_convert(block[:, j], dtypes[j]))
+
+    cols = []
+    for j in range(ncols):
+        if blocks[j] == []:
+            col = np.array([], dtype=dtypes[j] or str)
         else:
-            return header, cols
+            col = np.concatenate(blocks[j])
+        if dtypes[j] is None:
+            col = _convert(col)
+        cols.append(col)
+
+    return cols
+
+
+#-----------------------------------------------------------------------------#
+
+def _block_rows(rows, ncols, blocksize):
+    """ Generator turning the data rows into 2-D arrays of strings, 
+    'blocksize' rows at a time. As in :func:`readcol`, entries past the 
+    last column are dropped.
+
+    Parameters
+    ----------
+    rows : iterator
+        Lists of the entries of each data row.
+    ncols : int
+        The number of columns.
+    blocksize : int
+        Number of rows per block.
+
+    Yields
+    ------
+    block : array
+        String array of shape (rows in block, ncols).
+    """
+    while True:
+        chunk = list(islice(rows, blocksize))
+        if chunk == []:
+            return
+        try:
+            block = np.array(chunk, dtype=str)
+        except ValueError:
+            # Rows of different length; trim them to the header.
+            block = None
+        if block is None or block.shape[1] != ncols:
+            for linestrip in chunk:
+                if len(linestrip) < ncols:
+                    raise ValueError("Row {} has fewer than {} columns."\
+                        .format(linestrip, ncols))
+            block = np.array([linestrip[:ncols] for linestrip in chunk], 
+                dtype=str)
+        yield block
+
+
+#-----------------------------------------------------------------------------#
+
+def _column_dtype(header, j, dtype):
+    """ Returns the type requested for column 'j', or None if it is to 
+    be inferred.
+    """
+    if isinstance(dtype, dict):
+        if header[j] in dtype:
+            return dtype[header[j]]
+        return dtype.get(j)
+    return dtype
+
+
+#-----------------------------------------------------------------------------#
+
+def _convert(col, dtype=None):
+    """ Converts an array of strings to 'dtype'. If 'dtype' is None, 
+    tries int, then float, and otherwise leaves the strings.
+    """
+    if dtype is not None:
+        return col.astype(dtype)
+
+    for trial in (np.int64, np.float64):
+        try:
+            return col.astype(trial)
+        except (ValueError, OverflowError):
+            pass
 
-    except IOError:
-        print("File {} does not exist.".format(filename))
-        return [], []
+    return col
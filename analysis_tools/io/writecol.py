@@ -10,15 +10,25 @@ Author:
 
 from __future__ import print_function
 from __future__ import with_statement
+from itertools import chain
 import numpy as np
 import os
 import re
 import sys
 
+from analysis_tools.tables.columntable import ColumnTable
+
+# Number of rows formatted and written at once.
+_BLOCKSIZE = 50000
+
+# Types whose Python scalars print the same as their NumPy scalars.
+_TOLIST_KINDS = 'biuUS'
+_TOLIST_TYPES = (np.float64, np.complex128)
+
 #-----------------------------------------------------------------------------#
 
 def writecol(filename, data, header=[], delimiter=' ', headerstarter='# ', 
-    writer='a+', overwrite=False):
+    writer='a+', overwrite=False, fmt=None, format='text'):
     """ Write the a list of lists into a text file, where each sublist is 
     a column. 
 
@@ -26,9 +36,10 @@ def writecol(filename, data, header=[], delimiter=' ', headerstarter='# ',
     ----------
     filename : str
         Name of the file to write to.
-    data : list of lists
+    data : list of lists or ColumnTable
         Can contain any type. The lists will become the columns and must 
-        all be the same length.
+        all be the same length. A ColumnTable also gives the header, 
+        unless one is passed.
     header : list
         Optional. The names of the columns.
     delimiter : str
@@ -42,6 +53,16 @@ def writecol(filename, data, header=[], delimiter=' ', headerstarter='# ',
         writer = 'a') if the file already exists. False by default.
         Meant as a dummy-proof in case you didn't enter the 'writer' you
         intended.
+    fmt : str or list of str
+        Optional. A %-style format, e.g., '%.6f', for every column or a 
+        list with one format per column. By default, each item is written 
+        as str(item).
+    format : {'text', 'npy', 'fits'}
+        Optional. 'npy' and 'fits' write a binary table (a NumPy 
+        structured array or a FITS binary table) with the header as the 
+        column names, which :func:`readcol` loads memory-mapped. Binary 
+        files are always written whole, never appended to. 'text' by 
+        default.
 
     """
 
@@ -58,6 +79,11 @@ def writecol(filename, data, header=[], delimiter=' ', headerstarter='# ',
     else:
         print("File '{}' is being created...".format(filename))
 
+    if isinstance(data, ColumnTable):
+        if header == []:
+            header = data.names
+        data = data.columns
+
     # Record number of columns.
     ncols = len(data)
 
@@ -75,6 +101,17 @@ def writecol(filename, data, header=[], delimiter=' ', headerstarter='# ',
             .format(len(header), ncols)) 
         return
 
+    # Check that formats, if given, match number of columns.
+    if not isinstance(fmt, (type(None), str)) and len(fmt) != ncols:
+        print("Error: length of fmt, {}, does not match number of columns, {}."\
+            .format(len(fmt), ncols)) 
+        return
+    rowformat = _row_format(ncols, fmt, delimiter)
+
+    if format != 'text':
+        _write_binary(filename, data, header, format)
+        return
+
     with open(filename, writer) as f:
 
         # Write a header if one given.
@@ -87,15 +124,229 @@ def writecol(filename, data, header=[], delimiter=' ', headerstarter='# ',
                     headerline += header[j] + delimiter 
             f.write(headerline)
 
-        # Write each sublist as a column.
-        for i in range(nrows):
-            line = ''
-            for j in range(ncols):
-                if j == ncols-1:
-                    line += str(data[j][i]) + '\n'
-                else:
-                    line += str(data[j][i]) + delimiter
-            
-            f.write(line)
+        # Write the columns a block of rows at a time.
+        for start in range(0, nrows, _BLOCKSIZE):
+            f.write(_format_block(data, rowformat, start, start+_BLOCKSIZE))
+
+
+#-----------------------------------------------------------------------------#
+
+def _write_binary(filename, data, header, format):
+    """ Writes the columns as one binary table. See :func:`writecol`.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file to write to.
+    data : list of lists or arrays
+        The columns.
+    header : list
+        The names of the columns. If empty, the columns are named by 
+        number, starting at '0'.
+    format : {'npy', 'fits'}
+        The kind of binary table.
+    """
+    if format not in ('npy', 'fits'):
+        print("Error: unknown format, {}.".format(format))
+        return
+
+    names = header if header != [] else [str(j) for j in range(len(data))]
+    cols = [np.asarray(col) for col in data]
+    if any(col.dtype.kind == 'O' for col in cols):
+        print("Error: columns must be of numbers or strings for format '{}'."\
+            .format(format))
+        return
+
+    table = np.empty(len(cols[0]), 
+        dtype=[(str(name), col.dtype) for name, col in zip(names, cols)])
+    for name, col in zip(names, cols):
+        table[name] = col
+
+    if format == 'npy':
+        # Write through a file object, else numpy adds a '.npy' extension.
+        with open(filename, 'wb') as f:
+            np.save(f, table)
+    else:
+        from astropy.table import Table
+        Table(table).write(filename, format='fits', overwrite=True)
+
+
+#-----------------------------------------------------------------------------#
+
+def _row_format(ncols, fmt, delimiter):
+    """ Returns the %-style format of one row.
+
+    Parameters
+    ----------
+    ncols : int
+        The number of columns.
+    fmt : str, list of str, or None
+        Format of every column, or of each column. None for '%s'.
+    delimiter : str
+        How to divide the columns.
+
+    Returns
+    -------
+    rowformat : str
+        Format taking the items of a row and ending in a newline.
+    """
+    if fmt is None:
+        fmt = '%s'
+    if isinstance(fmt, str):
+        fmt = [fmt] * ncols
+
+    return delimiter.replace('%', '%%').join(fmt) + '\n'
+
+
+#-----------------------------------------------------------------------------#
+
+def _format_block(data, rowformat, start, stop):
+    """ Formats rows 'start' through 'stop' of the columns with a single
+    string operation.
+
+    Parameters
+    ----------
+    data : list of lists or arrays
+        The columns.
+    rowformat : str
+        As returned by :func:`_row_format`.
+    start, stop : int
+        The rows to format.
+
+    Returns
+    -------
+    block : str
+        The formatted rows.
+    """
+    cols = []
+    for col in data:
+        col = col[start:stop]
+        # Plain Python items are much faster to format, but only swap 
+        # them in where that prints the same as the NumPy item.
+        if isinstance(col, np.ndarray) and (col.dtype.kind in _TOLIST_KINDS 
+            or col.dtype.type in _TOLIST_TYPES):
+            col = col.tolist()
+        cols.append(col)
+
+    nrows = min(len(col) for col in cols)
+
+    return (rowformat * nrows) % tuple(chain.from_iterable(zip(*cols)))
+
+
+#-----------------------------------------------------------------------------#
+
+class ColumnWriter(object):
+    """ Writes columns to a text file batch by batch, keeping the file 
+    open in between. Output is the same as one :func:`writecol` call with 
+    all the batches joined.
+
+    Use
+    ---
+        with ColumnWriter('out.txt', header=['x', 'y'], writer='w') as w:
+            for x, y in batches:
+                w.write_batch([x, y])
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file to write to.
+    header : list
+        Optional. The names of the columns.
+    delimiter : str
+        Optional. How to divide the columns. A single space by default.
+    headerstarter : str
+        Optional. String with which to start a header. '#' by default.
+    writer : str
+        Optional. The file writing preference. 'a+' by default.
+    overwrite : {True, False}
+        Optional. Whether to overwrite or append if the file already 
+        exists. False by default, in which case an IOError is raised.
+    fmt : str or list of str
+        Optional. See :func:`writecol`.
+    buffersize : int
+        Optional. Number of characters held before writing to the file.
+    """
+
+    def __init__(self, filename, header=[], delimiter=' ', 
+        headerstarter='# ', writer='a+', overwrite=False, fmt=None, 
+        buffersize=2**20):
+        if os.path.isfile(filename) and not overwrite:
+            raise IOError("File '{}' already exists and overwrite is set to False."\
+                .format(filename))
+
+        self.filename = filename
+        self.header = header
+        self.delimiter = delimiter
+        self.fmt = fmt
+        self.buffersize = buffersize
+        self.nrows = 0
+
+        # Known from the header now, or else from the first batch.
+        self._ncols = len(header) if header != [] else None
+        self._rowformat = None
+        self._buffer = []
+        self._nbuffered = 0
+
+        self._f = open(filename, writer)
+        if header != []:
+            self._write(headerstarter + delimiter.join(header) + '\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_batch(self, data):
+        """ Adds rows to the file.
+
+        Parameters
+        ----------
+        data : list of lists or arrays, or ColumnTable
+            One list for each column, all the same length.
+        """
+        if isinstance(data, ColumnTable):
+            data = data.columns
+        if self._ncols is None:
+            self._ncols = len(data)
+        if len(data) != self._ncols:
+            raise ValueError("Number of columns, {}, does not match {}."\
+                .format(len(data), self._ncols))
+        if not all(len(col) == len(data[0]) for col in data):
+            raise ValueError("Columns not all same length.")
+
+        if self._rowformat is None:
+            if not isinstance(self.fmt, (type(None), str)) \
+                and len(self.fmt) != self._ncols:
+                raise ValueError("Length of fmt, {}, does not match number of columns, {}."\
+                    .format(len(self.fmt), self._ncols))
+            self._rowformat = _row_format(self._ncols, self.fmt, 
+                self.delimiter)
+
+        nrows = len(data[0])
+        for start in range(0, nrows, _BLOCKSIZE):
+            self._write(_format_block(data, self._rowformat, start, 
+                start+_BLOCKSIZE))
+        self.nrows += nrows
+
+    def flush(self):
+        """ Writes any buffered rows to the file.
+        """
+        if self._buffer != []:
+            self._f.write(''.join(self._buffer))
+            self._buffer = []
+            self._nbuffered = 0
+        self._f.flush()
 
+    def close(self):
+        """ Writes any buffered rows and closes the file.
+        """
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
 
+    def _write(self, text):
+        self._buffer.append(text)
+        self._nbuffered += len(text)
+        if self._nbuffered >= self.buffersize:
+            self.flush()
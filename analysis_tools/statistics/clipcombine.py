@@ -0,0 +1,131 @@
+
+from __future__ import print_function
+
+from astropy.io import fits
+import numpy as np
+
+from analysis_tools.statistics.meanclip import _meanclip_lanes
+
+
+def clipcombine(files, ext=1, rows_per_block=None, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, return_median=0, outfile=None, overwrite=False, block_bytes=2**27):
+    """Combines FITS frames, e.g., calibrated FLTs, into one image by an
+    iteratively sigma-clipped mean of each pixel across the frames.
+
+    The frames are opened memory-mapped and read a block of rows at a
+    time, the same rows from every frame, into one reused buffer. Every
+    pixel of the block is then clipped at once, giving what meanclip
+    would give on that pixel's values alone. Memory is bounded by the
+    block, whatever the number of frames.
+
+    Parameters:
+        files : list of strings
+            Names of the FITS files, whose images must all be the same
+            shape.
+
+        ext : int, str or tuple
+            The extension holding the image, e.g., 1 or ('SCI', 1).
+
+        rows_per_block : int
+            Number of image rows read from each frame at a time. By
+            default, as many as fit the block in block_bytes.
+
+        clipsig : float
+            Number of sigma at which to clip.
+
+        maxiter : int
+            Ceiling on number of clipping iterations.
+
+        converge_num : float
+            If the proportion of rejected pixels is less than
+            this fraction, the iterations stop.
+
+        verbose : {0, 1}
+            Print messages to screen?
+
+        return_median : {0, 1}
+            Combine by the median if 1. By the mean if 0.
+
+        outfile : string
+            If given, name of a FITS file to write, with the combined
+            image in the primary extension and the rejection map in the
+            'REJECT' extension.
+
+        overwrite : {True, False}
+            Overwrite outfile if it exists?
+
+        block_bytes : int
+            Size of the block buffer when rows_per_block is not given.
+            Clipping takes about three times the buffer at its peak.
+
+    Returns:
+        combined : array
+            The N-sigma clipped mean or median of each pixel.
+        reject : array
+            The number of frames rejected at each pixel. NaNs in a frame
+            are ignored rather than counted as rejected.
+
+    Outputs:
+        Prints to screen the number of frames and blocks.
+        Writes outfile, if given.
+
+    Examples:
+
+    >>> combined, reject = clipcombine(glob.glob('*flt.fits'), ext=('SCI', 1))
+    >>> clipcombine(flts, outfile='combined.fits', rows_per_block=64)
+    """
+    files = list(files)
+    nframes = len(files)
+    hduls = [fits.open(filename, memmap=True) for filename in files]
+
+    try:
+        hdus = [hdul[ext] for hdul in hduls]
+        shape = hdus[0].shape
+        for filename, hdu in zip(files, hdus):
+            if hdu.shape != shape:
+                raise ValueError("Shape of {}, {}, does not match {}."\
+                    .format(filename, hdu.shape, shape))
+        # Sections read and scale only the rows asked for.
+        sections = [hdu.section for hdu in hdus]
+
+        nrows = shape[0]
+        rowsize = int(np.prod(shape[1:]))
+        if rows_per_block is None:
+            rows_per_block = max(1, block_bytes // (8 * nframes * rowsize))
+        rows_per_block = min(rows_per_block, nrows)
+
+        combined = np.empty(shape)
+        reject = np.empty(shape, dtype=int)
+
+        # One lane of frames per pixel of the block.
+        buf = np.empty((rows_per_block * rowsize, nframes))
+        nblocks = 0
+        for y0 in range(0, nrows, rows_per_block):
+            y1 = min(y0 + rows_per_block, nrows)
+            lanes = buf[:(y1 - y0) * rowsize]
+            for j, section in enumerate(sections):
+                lanes[:, j] = np.asarray(section[y0:y1], dtype=float).reshape(-1)
+            nvalid = np.sum(~np.isnan(lanes), axis=-1)
+
+            val, sigma, niter, count = _meanclip_lanes(lanes, clipsig,
+                maxiter, converge_num, return_median)
+            combined[y0:y1] = val.reshape((y1 - y0,) + shape[1:])
+            reject[y0:y1] = (nvalid - count).reshape((y1 - y0,) + shape[1:])
+            nblocks += 1
+    finally:
+        for hdul in hduls:
+            hdul.close()
+
+    if verbose:
+        prf = 'CLIPCOMBINE:'
+        print('{} {:.1f}-sigma clipped {} of {} frames'.format(prf, clipsig,
+            'median' if return_median else 'mean', nframes))
+        print('{} Read in {} blocks of {} rows'.format(prf, nblocks, rows_per_block))
+
+    if outfile is not None:
+        primary = fits.PrimaryHDU(combined)
+        primary.header['NCOMBINE'] = (nframes, 'Number of frames combined')
+        primary.header['CLIPSIG'] = (clipsig, 'Sigma at which frames were clipped')
+        fits.HDUList([primary, fits.ImageHDU(reject, name='REJECT')])\
+            .writeto(outfile, overwrite=overwrite)
+
+    return combined, reject
@@ -1,9 +1,11 @@
 from __future__ import print_function
 
+import bisect
 import numpy as np
+import warnings
 
 
-def meanclip(indata, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, return_array=0, return_median=0):
+def meanclip(indata, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, return_array=0, return_median=0, axis=None, method='sort', dtype=None, inplace=False, out=None, return_diagnostics=0):
     """Computes an iteratively sigma-clipped mean on a data set. 
     
     Clipping is done about median, but mean is returned by default 
@@ -33,12 +35,61 @@ def meanclip(indata, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, retur
         return_median : {0, 1}
             Return the median if 1. Return the mean if 0. 
         
+        axis : int or None
+            If given, clip each lane along this axis separately, all
+            lanes at once, e.g., axis=0 for each pixel across a stack
+            of frames. NaNs are ignored. See Returns.
+        
+        method : {'sort', 'select'}
+            'sort' clips by copying out the remaining pixels each 
+            iteration. 'select' gives the same results (to floating
+            point) much faster on large arrays: it keeps the remaining 
+            pixels as a range of values in reused buffers, finds medians
+            with np.partition and keeps running sums for sigma. Finite
+            data only. Not used with axis.
+        
+        dtype : dtype
+            For method 'select', the precision of the working buffers,
+            e.g., 'float32' to halve the memory used on float32 images.
+            Sums are always kept in float64. By default, float64.
+        
+        inplace : {True, False}
+            For method 'select', use indata itself as the working 
+            buffer, so that nothing the size of the data is copied.
+            indata must be a writeable, C-contiguous array of type dtype,
+            and is left reordered. Not with return_array.
+        
+        out : array
+            For method 'select', a contiguous array of type dtype and at
+            least the size of indata to use as the working buffer, e.g.,
+            one kept between calls. It is overwritten.
+        
+        return_diagnostics : {0, 1}
+            For method 'select', also return a dictionary of 'niter', 
+            the number of iterations, 'count', the number of remaining
+            pixels, and 'peak_bytes', the most memory held at once by 
+            the arrays meanclip allocated.
+        
     Returns:
         val : float
             The N-sigma clipped mean or median.
         sigma : float
             The standard deviation of remaining pixels.
         
+        If axis is given, instead:
+        val : array
+            The clipped mean or median of each lane.
+        sigma : array
+            The standard deviation of the remaining pixels of each lane.
+        niter : array
+            The number of iterations done for each lane.
+        count : array
+            The number of remaining pixels of each lane.
+        If return_array is 1, a boolean array the shape of indata, True
+        for the pixels used to compute statistics, is returned instead.
+        
+        If return_diagnostics is 1, the diagnostics are returned last.
+        
     Outputs:
         Prints to screen mean or median statistics.      
         
@@ -48,6 +99,8 @@ def meanclip(indata, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, retur
         * 24/11/2009 Converted to Python. PLL.
         * 08/01/2013 Added option to return the array indices of non-clipped pixels. DMH
         * Added option to return median of the clipped array. DMH
+        * 18/10/2026 Added axis and the 'select' method. CMG
+        * 18/10/2026 Added dtype, inplace, out and return_diagnostics. CMG
     
     Notes:
         This is based on MYMEANCLIP routine from ACS library.    
@@ -55,7 +108,34 @@ def meanclip(indata, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, retur
     Examples:
     
     >>> mean, sigma = meanclip(indata)
+    >>> means, sigmas, niter, count = meanclip(stack, axis=0)
+    >>> mean, sigma, diag = meanclip(image, method='select', dtype='float32', 
+    ...     return_diagnostics=1)
     """
+    if method not in ('sort', 'select'):
+        raise ValueError("Invalid method, {}".format(method))
+
+    if axis is not None:
+        return _meanclip_axis(indata, axis, clipsig, maxiter, converge_num,
+            verbose, return_array, return_median)
+
+    if method == 'select':
+        val, sigma, iter, ct, arrind, peak = _meanclip_select(indata, clipsig, 
+            maxiter, converge_num, return_median, return_array, dtype, 
+            inplace, out)
+        val_type = 'median' if return_median else 'mean'
+        result = _meanclip_report(val, val_type, sigma, iter, clipsig, 
+            verbose, return_array, arrind)
+        if return_diagnostics:
+            diagnostics = {'niter': iter, 'count': int(ct), 'peak_bytes': peak}
+            if return_array:
+                return result, diagnostics
+            return result + (diagnostics,)
+        return result
+    elif dtype is not None or inplace or out is not None or return_diagnostics:
+        raise ValueError("dtype, inplace, out and return_diagnostics are "
+            "for method='select'.")
+    
     # Flatten array
     skpix = indata.reshape( indata.size, )
     
@@ -87,8 +167,14 @@ def meanclip(indata, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, retur
         val_type = 'mean'
     sigma = np.std( skpix )
     
+    return _meanclip_report(val, val_type, sigma, iter, clipsig, verbose, 
+        return_array, arrind)
+
+
+def _meanclip_report(val, val_type, sigma, iter, clipsig, verbose, return_array, arrind):
+    """Prints the meanclip messages and returns its output."""
     if verbose:
-        if return_median:
+        if val_type == 'median':
             prf = 'MEDIANCLIP:'
             print('{} {}.1f-sigma clipped median'.format(prf, clipsig))
             print('{} Median computed in {} iterations'.format(prf, iter))
@@ -103,4 +189,339 @@ def meanclip(indata, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, retur
     if return_array:
         return np.copy(arrind)
     else:
-        return val, sigma
\ No newline at end of file
+        return val, sigma
+
+def _meanclip_axis(indata, axis, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, return_array=0, return_median=0):
+    """Computes an iteratively sigma-clipped mean along one axis, every 
+    lane at once. Rejected pixels are set to NaN in a working copy and the
+    statistics are taken with NaN-aware functions. Lanes stop iterating
+    on their own, by the same rule as meanclip.
+    
+    Parameters and Returns are as for meanclip with axis given.
+    """
+    # Working copy, with the clipping axis last.
+    work = np.array(np.moveaxis(np.asarray(indata), axis, -1), dtype=float)
+    lane_shape = work.shape[:-1]
+    
+    ct = np.sum(np.isfinite(work), axis=-1)
+    niter = np.zeros(lane_shape, dtype=int)
+    active = np.ones(lane_shape, dtype=bool)
+    iter = 0
+    
+    # All-NaN lanes warn on every statistic; they just come out NaN.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        
+        while active.any() and (iter < maxiter):
+            sub = work[active]
+            lastct = ct[active]
+            medval = np.nanmedian(sub, axis=-1)
+            sig = np.nanstd(sub, axis=-1)
+            keep = abs(sub - medval[..., None]) < clipsig*sig[..., None]
+            newct = np.sum(keep, axis=-1)
+            
+            # As in meanclip, a lane losing every pixel keeps them all.
+            clipped = (newct > 0)[..., None] & ~keep
+            sub[clipped] = np.nan
+            work[active] = sub
+            
+            c1 = abs(newct - lastct)
+            c2 = converge_num * lastct
+            niter[active] += 1
+            ct[active] = newct
+            active[active] = (c1 >= c2)
+            iter += 1
+        
+        if return_median:
+            val = np.nanmedian(work, axis=-1)
+            val_type = 'median'
+        else:
+            val = np.nanmean(work, axis=-1)
+            val_type = 'mean'
+        sigma = np.nanstd(work, axis=-1)
+    kept = np.isfinite(work)
+    count = np.sum(kept, axis=-1)
+    
+    if verbose:
+        prf = 'MEANCLIP:'
+        print('{} {:.1f}-sigma clipped {} of {} lanes'.format(prf, clipsig, val_type, val.size))
+        print('{} Computed in at most {} iterations'.format(prf, iter))
+    
+    if return_array:
+        return np.moveaxis(kept, -1, axis)
+    else:
+        return val, sigma, niter, count
+
+
+def _meanclip_select(indata, clipsig=3.0, maxiter=5, converge_num=0.02, return_median=0, return_array=0, dtype=None, inplace=False, out=None):
+    """Computes an iteratively sigma-clipped mean as meanclip does, 
+    without copying out the remaining pixels each iteration.
+    
+    Clipping about the median keeps the pixels within a distance of it,
+    so the remaining pixels are always all those with values in some
+    [kmin, kmax]. That range is all that is tracked. The median is found
+    by partitioning a working copy in place, since the remaining pixels 
+    are a run of the sorted values; positions already fixed by earlier
+    partitions bound later ones, so each partitions less of the array.
+    Sigma comes from sums about the first median, updated only when 
+    pixels are rejected.
+    
+    Parameters are as for meanclip.
+    
+    Returns:
+        val : float
+            The N-sigma clipped mean or median.
+        sigma : float
+            The standard deviation of remaining pixels.
+        iter : int
+            The number of iterations.
+        nkept : int
+            The number of remaining pixels.
+        arrind : array or None
+            The indices of the remaining pixels if return_array.
+        peak : int
+            The bytes of the arrays allocated here.
+    """
+    dtype = np.dtype(float if dtype is None else dtype)
+    if dtype.kind != 'f':
+        raise ValueError("dtype must be floating point, not {}.".format(dtype))
+    data = np.asarray(indata)
+    
+    # The working buffer, which is partitioned in place.
+    peak = 0
+    if inplace:
+        if return_array or out is not None:
+            raise ValueError("inplace cannot be used with return_array or out.")
+        if data.dtype != dtype or not data.flags.c_contiguous \
+            or not data.flags.writeable:
+            raise ValueError("inplace needs a writeable, C-contiguous {} "
+                "array.".format(dtype))
+        work = data.reshape(-1)
+    elif out is not None:
+        if out.dtype != dtype or not out.flags.c_contiguous \
+            or out.size < data.size:
+            raise ValueError("out must be a C-contiguous {} array of at "
+                "least {} values.".format(dtype, data.size))
+        work = out.reshape(-1)[:data.size]
+        np.copyto(work.reshape(data.shape), data, casting='unsafe')
+    else:
+        work = np.array(data, dtype=dtype).reshape(-1)
+        peak += work.nbytes
+    
+    # Buffers reused by every iteration.
+    diff = np.empty(work.size, dtype=dtype)
+    keep = np.empty(work.size, dtype=bool)
+    scratch = np.empty(work.size, dtype=bool)
+    peak += diff.nbytes + keep.nbytes + scratch.nbytes
+    
+    kmin, kmax = -np.inf, np.inf
+    nlo = 0
+    fixed = [-1, work.size]
+    nkept = ct = work.size
+    shift = None
+    iter = 0; c1 = 1.0 ; c2 = 0.0
+    
+    while (c1 >= c2) and (iter < maxiter):
+        lastct = ct
+        medval = _select_median(work, nlo, nkept, fixed)
+        if shift is None:
+            shift = medval
+            s1, s2 = _shifted_sums(work, shift, diff)
+        sig = _sums_std(s1, s2, nkept)
+        
+        np.subtract(work, medval, out=diff)
+        np.absolute(diff, out=diff)
+        np.less(diff, clipsig*sig, out=keep)
+        if nkept < work.size:
+            np.greater_equal(work, kmin, out=scratch)
+            keep &= scratch
+            np.less_equal(work, kmax, out=scratch)
+            keep &= scratch
+        ct = np.count_nonzero(keep)
+        
+        if ct > 0 and ct != nkept:
+            kmin = np.min(work, where=keep, initial=np.inf)
+            kmax = np.max(work, where=keep, initial=-np.inf)
+            nlo = np.count_nonzero(np.less(work, kmin, out=scratch))
+            nkept = ct
+            s1, s2 = _shifted_sums(work, shift, diff, keep)
+        
+        c1 = abs(ct - lastct)
+        c2 = converge_num * lastct
+        iter += 1
+    
+    if return_median:
+        val = _select_median(work, nlo, nkept, fixed)
+    else:
+        val = shift + s1 / nkept
+    sigma = _sums_std(s1, s2, nkept)
+    
+    arrind = None
+    if return_array:
+        # Compared in the working precision, as the clipping was.
+        signature = (dtype, dtype, bool)
+        np.greater_equal(data, kmin, out=keep.reshape(data.shape), 
+            signature=signature)
+        np.less_equal(data, kmax, out=scratch.reshape(data.shape), 
+            signature=signature)
+        keep &= scratch
+        arrind = np.flatnonzero(keep)
+        peak += arrind.nbytes
+    
+    return np.float64(val), np.float64(sigma), iter, nkept, arrind, peak
+
+
+def _select_median(work, nlo, nkept, fixed):
+    """Median of the nkept values of work that follow the nlo smallest,
+    partitioning work in place. fixed is the sorted list of positions 
+    already holding their sorted value, bracketed by -1 and work.size; 
+    it is updated."""
+    k1 = nlo + (nkept - 1) // 2
+    k2 = nlo + nkept // 2
+    for k in (k1, k2):
+        i = bisect.bisect_left(fixed, k)
+        if fixed[i] == k:
+            continue
+        # Only the values between the neighbouring fixed positions can
+        # belong at k.
+        start, stop = fixed[i-1] + 1, fixed[i]
+        kth = [k - start]
+        if k == k1 and k2 != k1 and k2 < stop:
+            kth.append(k2 - start)
+        work[start:stop].partition(kth)
+        for kk in kth:
+            bisect.insort(fixed, kk + start)
+    if k1 == k2:
+        return float(work[k1])
+    return (float(work[k1]) + float(work[k2])) / 2.
+
+
+def _shifted_sums(work, shift, diff, keep=None):
+    """Sums of (work - shift) and its square over the kept values, using
+    diff as the scratch buffer. The sums are float64 whatever the type
+    of the buffers."""
+    np.subtract(work, shift, out=diff)
+    if keep is not None:
+        np.multiply(diff, keep, out=diff)
+    s1 = np.sum(diff, dtype=np.float64)
+    if diff.dtype == np.float64:
+        s2 = np.dot(diff, diff)
+    else:
+        # A float32 dot product would also sum in float32.
+        s2 = np.sum(np.square(diff, out=diff), dtype=np.float64)
+    return s1, s2
+
+
+def _sums_std(s1, s2, n):
+    """Standard deviation from sums about a shift."""
+    mean = s1 / n
+    return np.sqrt(max(s2 / n - mean * mean, 0.))
+
+
+def _meanclip_lanes(lanes, clipsig=3.0, maxiter=5, converge_num=0.02, return_median=0):
+    """Computes an iteratively sigma-clipped mean along the last axis of
+    a 2-D array, as _meanclip_axis does, for many lanes of many pixels.
+    
+    Each lane is sorted once, in place. The remaining pixels of a lane are then a
+    run [lo, hi) of its sorted values, so medians are read off directly,
+    sums for sigma come from cumulative sums, and each iteration finds 
+    the new run by a binary search on every lane at once. NaNs are 
+    ignored.
+    
+    Returns:
+        val, sigma, niter, count : arrays
+            As for meanclip with axis given.
+    """
+    lanes.sort(axis=-1)
+    srt = lanes
+    nlanes, npix = srt.shape
+    rows = np.arange(nlanes)
+    
+    # NaNs sort to the end.
+    lo = np.zeros(nlanes, dtype=np.intp)
+    hi = np.sum(~np.isnan(srt), axis=-1)
+    ct = hi - lo
+    
+    # All-NaN lanes warn on every statistic; they just come out NaN.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        
+        # Cumulative sums of the values about each lane's median.
+        shift = np.nan_to_num(_lane_median(srt, rows, lo, hi))
+        diff = srt - shift[:, None]
+        diff[np.isnan(diff)] = 0.
+        s1 = np.zeros((nlanes, npix + 1))
+        np.cumsum(diff, axis=-1, out=s1[:, 1:])
+        np.square(diff, out=diff)
+        s2 = np.zeros((nlanes, npix + 1))
+        np.cumsum(diff, axis=-1, out=s2[:, 1:])
+        del diff
+
+        niter = np.zeros(nlanes, dtype=int)
+        active = np.ones(nlanes, dtype=bool)
+        iter = 0
+
+        while active.any() and (iter < maxiter):
+            act = np.flatnonzero(active)
+            lastct = ct[act]
+            alo, ahi = lo[act], hi[act]
+            medval = _lane_median(srt, act, alo, ahi)
+            lim = clipsig * _lane_std(s1, s2, act, alo, ahi)
+
+            # The run where abs(value - medval) < lim, as in meanclip.
+            newlo = _lane_search(srt, act, alo, ahi, 
+                lambda vals: (vals - medval) > -lim)
+            newhi = _lane_search(srt, act, newlo, ahi, 
+                lambda vals: (vals - medval) >= lim)
+            newct = newhi - newlo
+
+            # As in meanclip, a lane losing every pixel keeps them all.
+            some = newct > 0
+            lo[act[some]] = newlo[some]
+            hi[act[some]] = newhi[some]
+
+            c1 = abs(newct - lastct)
+            c2 = converge_num * lastct
+            niter[act] += 1
+            ct[act] = newct
+            active[act] = (c1 >= c2)
+            iter += 1
+
+        count = hi - lo
+        if return_median:
+            val = _lane_median(srt, rows, lo, hi)
+        else:
+            val = shift + (s1[rows, hi] - s1[rows, lo]) / count
+        sigma = _lane_std(s1, s2, rows, lo, hi)
+    
+    return val, sigma, niter, count
+
+
+def _lane_median(srt, rows, lo, hi):
+    """Medians of the runs [lo, hi) of sorted lanes; NaN if empty."""
+    k1 = np.clip(lo + (hi - lo - 1) // 2, 0, srt.shape[1] - 1)
+    k2 = np.clip(lo + (hi - lo) // 2, 0, srt.shape[1] - 1)
+    med = (srt[rows, k1] + srt[rows, k2]) / 2.
+    return np.where(hi > lo, med, np.nan)
+
+
+def _lane_std(s1, s2, rows, lo, hi):
+    """Standard deviations of the runs [lo, hi) from cumulative sums."""
+    n = hi - lo
+    mean = (s1[rows, hi] - s1[rows, lo]) / n
+    return np.sqrt(np.maximum((s2[rows, hi] - s2[rows, lo]) / n - mean * mean, 0.))
+
+
+def _lane_search(srt, rows, lo, hi, test):
+    """For each lane, the first position in [lo, hi) whose sorted value
+    passes test (hi if none), test being false then true along the run."""
+    lo = lo.copy()
+    hi = hi.copy()
+    while True:
+        open_ = lo < hi
+        if not open_.any():
+            return lo
+        mid = (lo + hi) // 2
+        passed = test(srt[rows, np.minimum(mid, srt.shape[1] - 1)])
+        hi = np.where(open_ & passed, mid, hi)
+        lo = np.where(open_ & ~passed, mid + 1, lo)
@@ -0,0 +1,271 @@
+
+from __future__ import print_function
+
+import numpy as np
+
+from analysis_tools.statistics.meanclip import _meanclip_report, _sums_std
+
+
+def meanclip_stream(data, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, return_median=0, nbins=2**16, refine=0, chunksize=2**20):
+    """Computes an iteratively sigma-clipped mean as meanclip does, for
+    data too large to hold in memory, reading it in chunks.
+
+    The remaining pixels are always those within some range of values,
+    so each iteration is one pass over the data that keeps running sums
+    (for the mean and sigma, which are exact) and a histogram of the
+    remaining pixels (for the median, which is known to within a bin).
+    The data are read at most maxiter + 2 times, plus refine passes per
+    median.
+
+    Parameters:
+        data : array_like, str, callable or list of arrays
+            The data: an array or np.memmap, read a slice at a time; the
+            name of a .npy file, which is memory-mapped; a function that
+            returns a new iterator of chunks each time it is called, e.g.,
+            ``lambda: readcol_iter(...)`` column chunks; or a list of
+            arrays. Non-finite values are ignored.
+
+        clipsig : float
+            Number of sigma at which to clip.
+
+        maxiter : int
+            Ceiling on number of clipping iterations.
+
+        converge_num : float
+            If the proportion of rejected pixels is less than
+            this fraction, the iterations stop.
+
+        verbose : {0, 1}
+            Print messages to screen?
+
+        return_median : {0, 1}
+            Return the median if 1. Return the mean if 0.
+
+        nbins : int
+            Number of histogram bins between the smallest and largest
+            remaining values. Each median is known to within a bin.
+
+        refine : int
+            Extra passes to narrow down each median, each histogramming
+            only the bin holding it. Once that bin holds no more than
+            chunksize values, they are gathered and the median is exact,
+            so refine=1 usually gives exactly meanclip's result.
+
+        chunksize : int
+            Number of values to read at a time from an array.
+
+    Returns:
+        val : float
+            The N-sigma clipped mean or median.
+        sigma : float
+            The standard deviation of remaining pixels.
+        error : dict
+            How far the result can be from that of meanclip on the whole
+            array in memory:
+            'median_error', the most the last median (the returned one,
+            if return_median) can be off by;
+            'nboundary', at most how many pixels lay close enough to a
+            clipping bound that meanclip may have kept a pixel rejected
+            here or the reverse. If 0, the remaining pixels, and so the
+            mean and sigma, are meanclip's;
+            'niter', the number of iterations;
+            'count', the number of remaining pixels;
+            'npasses', the number of passes over the data.
+
+    Outputs:
+        Prints to screen mean or median statistics.
+
+    Examples:
+
+    >>> mean, sigma, error = meanclip_stream(np.load('mosaic.npy', mmap_mode='r'))
+    >>> mean, sigma, error = meanclip_stream('mosaic.npy', refine=1)
+    """
+    chunks = _chunk_source(data, chunksize)
+
+    # The remaining pixels are those with lo < value < hi.
+    lo, hi = -np.inf, np.inf
+    stats = _scan(chunks, lo, hi)
+    shift = stats['shift']
+    npasses = 1
+    if stats['count'] == 0:
+        raise ValueError("No finite values in data.")
+    stats = _scan(chunks, lo, hi, shift, (stats['min'], stats['max']), nbins)
+    npasses += 1
+
+    ct = stats['count']
+    nboundary = 0; merr = 0.
+    iter = 0; c1 = 1.0 ; c2 = 0.0
+
+    while (c1 >= c2) and (iter < maxiter):
+        lastct = ct
+        medval, merr, passes = _hist_median(chunks, lo, hi, stats, nbins,
+            refine, chunksize)
+        npasses += passes
+        sig = _sums_std(stats['s1'], stats['s2'], stats['count'])
+
+        newlo = max(lo, medval - clipsig*sig)
+        newhi = min(hi, medval + clipsig*sig)
+        nboundary += _count_near(stats, [b for b in (newlo, newhi)
+            if lo < b < hi], merr)
+
+        new = _scan(chunks, newlo, newhi, shift,
+            (max(newlo, stats['min']), min(newhi, stats['max'])), nbins)
+        npasses += 1
+        ct = new['count']
+        if ct > 0:
+            lo, hi, stats = newlo, newhi, new
+        else:
+            # As in meanclip, which then iterates on the same pixels.
+            iter = maxiter
+            break
+
+        c1 = abs(ct - lastct)
+        c2 = converge_num * lastct
+        iter += 1
+
+    if return_median:
+        val, merr, passes = _hist_median(chunks, lo, hi, stats, nbins,
+            refine, chunksize)
+        npasses += passes
+        val_type = 'median'
+    else:
+        val = shift + stats['s1'] / stats['count']
+        val_type = 'mean'
+    sigma = _sums_std(stats['s1'], stats['s2'], stats['count'])
+
+    _meanclip_report(val, val_type, sigma, iter, clipsig, verbose, 0, None)
+    error = {'median_error': float(merr), 'nboundary': nboundary, 'niter': iter,
+        'count': stats['count'], 'npasses': npasses}
+
+    return val, sigma, error
+
+
+def _chunk_source(data, chunksize):
+    """Returns a function that returns a new iterator of 1-D float chunks
+    of data each time it is called."""
+    if isinstance(data, str):
+        data = np.load(data, mmap_mode='r')
+
+    if callable(data):
+        source = data
+    elif isinstance(data, np.ndarray):
+        flat = data.reshape(-1)
+        def source():
+            for start in range(0, flat.size, chunksize):
+                yield flat[start:start+chunksize]
+    elif iter(data) is data:
+        raise TypeError("data is an iterator, which can only be read once;"
+            " pass a function that returns a new one instead.")
+    else:
+        source = lambda: iter(data)
+
+    def chunks():
+        for chunk in source():
+            yield np.asarray(chunk, dtype=float).reshape(-1)
+
+    return chunks
+
+
+def _scan(chunks, lo, hi, shift=None, hist_range=None, nbins=None):
+    """One pass over the values with lo < value < hi, returning their
+    count, sums of (value - shift) and its square, min, max and, if
+    hist_range is given, histogram. With no shift, the mean of the first
+    chunk is used; it is returned as 'shift'."""
+    count = 0; s1 = 0.; s2 = 0.
+    vmin, vmax = np.inf, -np.inf
+    hist = None
+    if hist_range is not None and hist_range[1] > hist_range[0]:
+        hist = np.zeros(nbins, dtype=np.int64)
+
+    for chunk in chunks():
+        vals = chunk[(chunk > lo) & (chunk < hi)]
+        if vals.size == 0:
+            continue
+        if shift is None:
+            shift = np.mean(vals)
+        count += vals.size
+        diff = vals - shift
+        s1 += np.sum(diff)
+        s2 += np.dot(diff, diff)
+        vmin = min(vmin, np.min(vals))
+        vmax = max(vmax, np.max(vals))
+        if hist is not None:
+            hist += np.histogram(vals, bins=nbins, range=hist_range)[0]
+
+    edges = None
+    if hist is not None:
+        edges = np.linspace(hist_range[0], hist_range[1], nbins + 1)
+
+    return {'count': count, 's1': s1, 's2': s2, 'min': vmin, 'max': vmax,
+        'shift': shift, 'hist': hist, 'edges': edges}
+
+
+def _hist_median(chunks, lo, hi, stats, nbins, refine, chunksize):
+    """Median of the values with lo < value < hi from the histogram in
+    stats, narrowed down by up to refine more passes. Returns the median,
+    the most it can be off by, and the number of passes made."""
+    n = stats['count']
+    ranks = [(n - 1) // 2, n // 2]
+    if stats['hist'] is None:
+        # All the values are the same.
+        return stats['min'], 0., 0
+
+    hist, edges, nbelow = stats['hist'], stats['edges'], 0
+    passes = 0
+    while True:
+        cum = np.cumsum(hist)
+        bins = [np.searchsorted(cum, k - nbelow, side='right') for k in ranks]
+        left, right = edges[bins[0]], edges[bins[1] + 1]
+
+        # Place each rank within its bin as if the bin were filled evenly.
+        ests = []
+        for k, j in zip(ranks, bins):
+            before = nbelow + (cum[j-1] if j > 0 else 0)
+            frac = (k - before + 0.5) / hist[j]
+            ests.append(edges[j] + frac * (edges[j+1] - edges[j]))
+        medval = (ests[0] + ests[1]) / 2.
+        merr = max(medval - left, right - medval)
+
+        if passes == refine:
+            return medval, merr, passes
+
+        inside = cum[bins[1]] - (cum[bins[0]-1] if bins[0] > 0 else 0)
+        passes += 1
+        if inside <= chunksize:
+            vals, nbelow = _gather(chunks, lo, hi, left, right)
+            vals.sort()
+            return (vals[ranks[0]-nbelow] + vals[ranks[1]-nbelow]) / 2., 0., passes
+
+        # Histogram just the bins holding the median.
+        narrow = _scan(chunks, max(lo, np.nextafter(left, -np.inf)),
+            min(hi, np.nextafter(right, np.inf)), 0., (left, right), nbins)
+        nbelow += cum[bins[0]-1] if bins[0] > 0 else 0
+        hist, edges = narrow['hist'], narrow['edges']
+        if hist is None:
+            return left, 0., passes
+
+
+def _gather(chunks, lo, hi, left, right):
+    """One pass collecting the values with lo < value < hi that are
+    within [left, right], and counting those below left."""
+    vals = []
+    nbelow = 0
+    for chunk in chunks():
+        chunk = chunk[(chunk > lo) & (chunk < hi)]
+        nbelow += np.count_nonzero(chunk < left)
+        vals.append(chunk[(chunk >= left) & (chunk <= right)])
+    return np.concatenate(vals), nbelow
+
+
+def _count_near(stats, bounds, merr):
+    """At most how many values of the histogram in stats lie within merr
+    of any of bounds."""
+    if merr == 0 or stats['hist'] is None:
+        return 0
+    hist, edges = stats['hist'], stats['edges']
+    total = 0
+    for b in bounds:
+        first = max(np.searchsorted(edges, b - merr, side='right') - 1, 0)
+        last = np.searchsorted(edges, b + merr, side='left')
+        total += int(np.sum(hist[first:last]))
+    return total
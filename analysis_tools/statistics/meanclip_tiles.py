@@ -0,0 +1,151 @@
+
+from __future__ import print_function
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from analysis_tools.statistics.meanclip import _meanclip_lanes
+
+
+def meanclip_tiles(image, tile=(64, 64), workers=None, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, return_median=0, interpolate=0):
+    """Computes an iteratively sigma-clipped mean on each tile of an
+    image, e.g., for a sky background map.
+
+    Each row of tiles is clipped at once: every tile's pixels are sorted
+    once and clipped as a run of sorted values, which gives the same
+    result as meanclip on the tile alone. Rows of tiles are spread over
+    a pool of threads.
+
+    Parameters:
+        image : 2-D array_like
+            Input image. NaNs, e.g., masked pixels, are ignored.
+
+        tile : tuple of ints
+            (rows, columns) of a tile. Tiles on the top and right edges
+            are smaller if the image is not a whole number of tiles.
+
+        workers : int
+            Number of threads clipping rows of tiles at once. By default,
+            one row after the other.
+
+        clipsig : float
+            Number of sigma at which to clip.
+
+        maxiter : int
+            Ceiling on number of clipping iterations.
+
+        converge_num : float
+            If the proportion of rejected pixels is less than
+            this fraction, the iterations stop.
+
+        verbose : {0, 1}
+            Print messages to screen?
+
+        return_median : {0, 1}
+            Map the median if 1. Map the mean if 0.
+
+        interpolate : {0, 1}
+            If 1, the mean (or median) and sigma maps are interpolated
+            bilinearly between tile centers to the shape of the image.
+            See expand_tiles.
+
+    Returns:
+        val : 2-D array
+            The N-sigma clipped mean or median of each tile.
+        sigma : 2-D array
+            The standard deviation of the remaining pixels of each tile.
+        count : 2-D array
+            The number of remaining pixels of each tile, always one per
+            tile.
+
+    Outputs:
+        Prints to screen the size of the maps.
+
+    Examples:
+
+    >>> sky, sky_sigma, count = meanclip_tiles(image, tile=(64, 64), workers=8)
+    >>> sky, sky_sigma, count = meanclip_tiles(image, interpolate=1)
+    """
+    image = np.asarray(image)
+    if image.ndim != 2:
+        raise ValueError("image must be 2-D, not {}-D.".format(image.ndim))
+    ny, nx = image.shape
+    th, tw = tile
+    ntx = -(-nx // tw)
+
+    def clip_row(y0):
+        strip = image[y0:y0+th]
+        h = strip.shape[0]
+        # Lay each tile's pixels out as a lane, padding the right edge
+        # tile with NaNs, which are ignored.
+        lanes = np.empty((ntx, h*tw))
+        nfull = nx // tw
+        lanes[:nfull].reshape(nfull, h, tw)[:] = \
+            strip[:, :nfull*tw].reshape(h, nfull, tw).swapaxes(0, 1)
+        if nfull < ntx:
+            edge = lanes[nfull].reshape(h, tw)
+            edge[:] = np.nan
+            edge[:, :nx-nfull*tw] = strip[:, nfull*tw:]
+        return _meanclip_lanes(lanes, clipsig, maxiter, converge_num,
+            return_median)
+
+    starts = range(0, ny, th)
+    if workers is None:
+        rows = [clip_row(y0) for y0 in starts]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(clip_row, starts))
+
+    val = np.array([row[0] for row in rows])
+    sigma = np.array([row[1] for row in rows])
+    count = np.array([row[3] for row in rows])
+
+    if verbose:
+        prf = 'MEANCLIP:'
+        print('{} {:.1f}-sigma clipped {} of {} x {} tiles'.format(prf, clipsig,
+            'median' if return_median else 'mean', *val.shape))
+
+    if interpolate:
+        val = expand_tiles(val, image.shape, tile)
+        sigma = expand_tiles(sigma, image.shape, tile)
+
+    return val, sigma, count
+
+
+def expand_tiles(tile_map, shape, tile=(64, 64)):
+    """Interpolates a map of one value per tile, as from meanclip_tiles,
+    bilinearly to every pixel of the image.
+
+    Values are placed at the centers of their tiles (of the smaller
+    edge tiles too) and held constant beyond the outermost centers.
+
+    Parameters:
+        tile_map : 2-D array
+            One value per tile.
+
+        shape : tuple of ints
+            (rows, columns) of the image.
+
+        tile : tuple of ints
+            (rows, columns) of a tile.
+
+    Returns:
+        full : 2-D array
+            The map at the shape of the image.
+    """
+    tile_map = np.asarray(tile_map, dtype=float)
+
+    # Fractional tile index of each pixel row and column.
+    weights = []
+    for n, t, ntiles in zip(shape, tile, tile_map.shape):
+        starts = np.arange(ntiles) * t
+        centers = (starts + np.minimum(starts + t, n) - 1) / 2.
+        pos = np.interp(np.arange(n), centers, np.arange(ntiles, dtype=float))
+        i0 = np.minimum(pos.astype(int), max(ntiles - 2, 0))
+        i1 = np.minimum(i0 + 1, ntiles - 1)
+        weights.append((i0, i1, pos - i0))
+
+    (y0, y1, wy), (x0, x1, wx) = weights
+    wy = wy[:, None]
+    return ((1 - wy) * ((1 - wx) * tile_map[y0][:, x0] + wx * tile_map[y0][:, x1]) +
+        wy * ((1 - wx) * tile_map[y1][:, x0] + wx * tile_map[y1][:, x1]))
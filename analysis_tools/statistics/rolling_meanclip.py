@@ -0,0 +1,322 @@
+
+from __future__ import print_function
+
+import numpy as np
+import warnings
+
+from analysis_tools.statistics.meanclip import _lane_search
+
+
+def rolling_meanclip(data, window, clipsig=3.0, maxiter=5, converge_num=0.02, verbose=1, return_median=0, chunksize=2**15):
+    """Computes an iteratively sigma-clipped mean over every window of
+    a 1-D series, e.g., a light curve or guide-star jitter stream.
+
+    Rather than clipping each window from scratch, the values of a run
+    of windows are ranked once and put in a wavelet tree. Clipping about
+    the median always leaves the values within some range of ranks, and
+    the tree gives any window's count, sums, and k-th value within a
+    range of ranks in O(log n) steps, for all windows at once. Each
+    window gets the same result as meanclip on it alone.
+
+    Parameters:
+        data : array_like
+            Input series, 1-D. NaNs are ignored.
+
+        window : int
+            Number of values in a window.
+
+        clipsig : float
+            Number of sigma at which to clip.
+
+        maxiter : int
+            Ceiling on number of clipping iterations.
+
+        converge_num : float
+            If the proportion of rejected pixels is less than
+            this fraction, the iterations stop.
+
+        verbose : {0, 1}
+            Print messages to screen?
+
+        return_median : {0, 1}
+            Return the median if 1. Return the mean if 0.
+
+        chunksize : int
+            Number of windows clipped at once. Memory goes as
+            (chunksize + window) * log2(chunksize + window).
+
+    Returns:
+        val : array
+            The N-sigma clipped mean or median of data[i:i+window], for
+            each of the len(data) - window + 1 positions i.
+        sigma : array
+            The standard deviation of the remaining values of each
+            window.
+        nreject : array
+            The number of values rejected from each window.
+
+    Outputs:
+        Prints to screen the number of windows.
+
+    Examples:
+
+    >>> mean, sigma, nreject = rolling_meanclip(flux, 101)
+    >>> # Centered on each point, for an odd window
+    >>> trend = np.full(len(flux), np.nan)
+    >>> trend[50:-50] = mean
+    """
+    data = np.asarray(data, dtype=float)
+    if data.ndim != 1:
+        raise ValueError("data must be 1-D, not {}-D.".format(data.ndim))
+    if not 1 <= window <= len(data):
+        raise ValueError("Invalid window, {}, for {} values.".format(window,
+            len(data)))
+    npos = len(data) - window + 1
+
+    val = np.empty(npos)
+    sigma = np.empty(npos)
+    nreject = np.empty(npos, dtype=int)
+
+    # All-NaN windows warn on every statistic; they just come out NaN.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for start in range(0, npos, chunksize):
+            stop = min(start + chunksize, npos)
+            out = _clip_windows(data[start:stop+window-1], window, clipsig,
+                maxiter, converge_num, return_median)
+            val[start:stop], sigma[start:stop], nreject[start:stop] = out
+
+    if verbose:
+        prf = 'MEANCLIP:'
+        print('{} {:.1f}-sigma clipped {} of {} windows of {}'.format(prf,
+            clipsig, 'median' if return_median else 'mean', npos, window))
+
+    return val, sigma, nreject
+
+
+def _clip_windows(data, window, clipsig, maxiter, converge_num, return_median):
+    """rolling_meanclip on one run of data."""
+    tree = _RankTree(data)
+    nwin = len(data) - window + 1
+    l = np.arange(nwin)
+    r = l + window
+    isnan = np.concatenate([[0], np.cumsum(np.isnan(data))])
+    nvalid = window - (isnan[r] - isnan[l])
+
+    # The remaining values of a window are those with ranks in [lo, hi).
+    lo = np.zeros(nwin, dtype=np.intp)
+    hi = np.full(nwin, tree.nvalid, dtype=np.intp)
+    count, s1, s2 = tree.range_sums(l, r, lo, hi)
+    ct = count.copy()
+    active = np.ones(nwin, dtype=bool)
+    iter = 0
+
+    while active.any() and (iter < maxiter):
+        act = np.flatnonzero(active)
+        lastct = ct[act]
+        medval = tree.median(l[act], r[act], lo[act], count[act])
+        lim = clipsig * _std(s1[act], s2[act], count[act])
+
+        # The ranks where abs(value - medval) < lim, as in meanclip.
+        srt = tree.sorted[None, :]
+        rows = np.zeros(len(act), dtype=np.intp)
+        newlo = _lane_search(srt, rows, lo[act], hi[act],
+            lambda vals: (vals - medval) > -lim)
+        newhi = _lane_search(srt, rows, newlo, hi[act],
+            lambda vals: (vals - medval) >= lim)
+        newct, news1, news2 = tree.range_sums(l[act], r[act], newlo, newhi)
+
+        # As in meanclip, a window losing every value keeps them all.
+        some = act[newct > 0]
+        kept = newct > 0
+        lo[some], hi[some] = newlo[kept], newhi[kept]
+        count[some], s1[some], s2[some] = newct[kept], news1[kept], news2[kept]
+
+        c1 = abs(newct - lastct)
+        c2 = converge_num * lastct
+        ct[act] = newct
+        active[act] = (c1 >= c2)
+        iter += 1
+
+    if return_median:
+        val = tree.median(l, r, lo, count)
+    else:
+        val = tree.shift + s1 / count
+    sigma = _std(s1, s2, count)
+
+    return val, sigma, nvalid - count
+
+
+def _scatter(vals, positions):
+    """vals moved to positions."""
+    out = np.empty_like(vals)
+    out[positions] = vals
+    return out
+
+
+def _std(s1, s2, n):
+    """Standard deviations from sums about a shift."""
+    mean = s1 / n
+    return np.sqrt(np.maximum(s2 / n - mean * mean, 0.))
+
+
+class _RankTree(object):
+    """Wavelet tree over the ranks of a series of values, answering
+    queries on many windows [l, r) of the series at once.
+
+    Level d holds the positions of the series stably sorted by the top d
+    bits of their ranks, so each node of the tree, the ranks sharing
+    their top d bits, is a run of positions. For each level are kept the
+    running count of zero next bits, for moving a window down a level,
+    and running sums of the values and their squares (about 'shift')
+    that restart at every node, so that a sum over values all within a
+    range never has values outside it cancelled out of it.
+    """
+
+    def __init__(self, data):
+        order = np.argsort(data, kind='stable')
+        n = len(data)
+        self.n = n
+        self.nvalid = n - np.count_nonzero(np.isnan(data))
+        self.sorted = data[order]
+        self.shift = np.median(self.sorted[:self.nvalid]) if self.nvalid else 0.
+        rank = np.empty(n, dtype=np.intp)
+        rank[order] = np.arange(n)
+
+        self.nbits = L = max(1, n.bit_length())
+        # Ranks and values in the order of each level in turn.
+        lrank = rank
+        lvals = np.where(np.isnan(data), 0., data - self.shift)
+        positions = np.arange(n)
+        self.zeros = []
+        self.sums = [None]
+        for d in range(L):
+            one = ((lrank >> (L - 1 - d)) & 1) == 1
+            zeros = np.zeros(n + 1, dtype=np.intp)
+            np.cumsum(~one, out=zeros[1:])
+            self.zeros.append(zeros)
+
+            # Each position's place on the next level.
+            ns = (lrank >> (L - d)) << (L - d)
+            (l0, r0), (ns1, l1, r1) = self._children(d, ns, positions, positions)
+            nextpos = np.where(one, l1, l0)
+            lrank = _scatter(lrank, nextpos)
+            lvals = _scatter(lvals, nextpos)
+            self.sums.append([self._node_cumsum(lvals, L - 1 - d),
+                self._node_cumsum(lvals * lvals, L - 1 - d)])
+
+    def _node_cumsum(self, vals, shift):
+        """Running sums of vals restarting every 2**shift positions,
+        inclusive and exclusive of each position."""
+        size = 1 << shift
+        nnodes = -(-self.n // size)
+        padded = np.zeros(nnodes * size)
+        padded[:self.n] = vals
+        inclusive = np.cumsum(padded.reshape(nnodes, size), axis=1)\
+            .reshape(-1)[:self.n]
+        return inclusive, inclusive - vals
+
+    def _children(self, d, ns, l, r):
+        """Windows [l, r) of nodes starting at ns on level d, moved to
+        the nodes' children: (l, r) in the zero child, which starts at ns
+        too, and (ns, l, r) in the one child."""
+        zeros = self.zeros[d]
+        zl = zeros[l] - zeros[ns]
+        zr = zeros[r] - zeros[ns]
+        ns1 = ns + (1 << (self.nbits - 1 - d))
+        return (ns + zl, ns + zr), (ns1, ns1 + (l - ns - zl), ns1 + (r - ns - zr))
+
+    def _down(self, d, ns, l, r, bit):
+        """Moves windows [l, r) of nodes starting at ns on level d to
+        their children by bit, returning the children's ns, l, r."""
+        (l0, r0), (ns1, l1, r1) = self._children(d, ns, l, r)
+        one = bit == 1
+        return (np.where(one, ns1, ns), np.where(one, l1, l0),
+            np.where(one, r1, r0))
+
+    def _segment(self, e, i, j):
+        """Count and sums of positions [i, j) of level e, all in one
+        node."""
+        full = j > i
+        ii = np.clip(i, 0, self.n - 1)
+        jj = np.clip(j - 1, 0, self.n - 1)
+        out = [j - i]
+        for inclusive, exclusive in self.sums[e]:
+            out.append(np.where(full, inclusive[jj] - exclusive[ii], 0.))
+        return out
+
+    def count_below(self, l, r, x):
+        """Number of values of each window [l, r) with rank below x."""
+        L = self.nbits
+        ns = np.zeros_like(l)
+        count = np.zeros_like(l)
+        for d in range(L):
+            bit = (x >> (L - 1 - d)) & 1
+            zeros = self.zeros[d]
+            count += np.where(bit == 1, (zeros[r] - zeros[ns]) - (zeros[l] - zeros[ns]), 0)
+            ns, l, r = self._down(d, ns, l, r, bit)
+        return count
+
+    def kth(self, l, r, k):
+        """Rank of the k-th (from 0) smallest value of each window [l, r)."""
+        L = self.nbits
+        ns = np.zeros_like(l)
+        rank = np.zeros_like(l)
+        k = k.copy()
+        for d in range(L):
+            zeros = self.zeros[d]
+            nzeros = zeros[r] - zeros[l]
+            bit = (k >= nzeros).astype(np.intp)
+            k -= bit * nzeros
+            rank |= bit << (L - 1 - d)
+            ns, l, r = self._down(d, ns, l, r, bit)
+        return rank
+
+    def median(self, l, r, lo, count):
+        """Median of the count values of each window [l, r) from rank lo
+        up; NaN if count is 0."""
+        below = self.count_below(l, r, lo)
+        ranks = [self.kth(l, r, below + np.maximum(k, 0))
+            for k in ((count - 1) // 2, count // 2)]
+        vals = [self.sorted[np.minimum(rank, self.n - 1)] for rank in ranks]
+        return np.where(count > 0, (vals[0] + vals[1]) / 2., np.nan)
+
+    def range_sums(self, l, r, lo, hi):
+        """Count and sums about shift of the values of each window [l, r)
+        with ranks in [lo, hi), from the nodes wholly within the range.
+        """
+        L = self.nbits
+        count = np.zeros_like(l)
+        s1 = np.zeros(len(l))
+        s2 = np.zeros(len(l))
+        # Follow lo and hi down from the root. Below where they part,
+        # the nodes beside lo's path on its high side, and beside hi's on
+        # its low side, are within [lo, hi).
+        na, la, ra = np.zeros_like(l), l, r
+        nb, lb, rb = np.zeros_like(l), l, r
+        parted = np.zeros(len(l), dtype=bool)
+        for d in range(L):
+            shift = L - 1 - d
+            bita = (lo >> shift) & 1 == 1
+            bitb = (hi >> shift) & 1 == 1
+            (la0, ra0), (na1, la1, ra1) = self._children(d, na, la, ra)
+            (lb0, rb0), (nb1, lb1, rb1) = self._children(d, nb, lb, rb)
+            for i, j, take in ((la1, ra1, parted & ~bita),
+                    (lb0, rb0, parted & bitb)):
+                c, t1, t2 = self._segment(d + 1, i, j)
+                count += np.where(take, c, 0)
+                s1 += np.where(take, t1, 0.)
+                s2 += np.where(take, t2, 0.)
+            parted |= bita != bitb
+            na, la, ra = (np.where(bita, na1, na), np.where(bita, la1, la0),
+                np.where(bita, ra1, ra0))
+            nb, lb, rb = (np.where(bitb, nb1, nb), np.where(bitb, lb1, lb0),
+                np.where(bitb, rb1, rb0))
+
+        # lo's own leaf is in the range too.
+        c, t1, t2 = self._segment(L, la, ra)
+        count += np.where(parted, c, 0)
+        s1 += np.where(parted, t1, 0.)
+        s2 += np.where(parted, t2, 0.)
+
+        return count, s1, s2
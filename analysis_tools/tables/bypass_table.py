@@ -15,11 +15,20 @@ Date:
 import astropy
 from astropy.table import Table
 from collections import OrderedDict
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+import functools
+import numpy as np
+
+from analysis_tools.tables.columntable import ColumnTable
 
 
 #-----------------------------------------------------------------------------#
 
-def decompose_table(tab, return_type=list, include_meta=False):
+def decompose_table(tab, return_type=list, include_meta=False, copy=True,
+    lazy=False):
     """
     Breaks an Astropy Table into lists or ordered dictionaries.
 
@@ -27,14 +36,24 @@ def decompose_table(tab, return_type=list, include_meta=False):
     ----------
     tab : Table
         An Astropy Table of some sort.
-    return_type : {list, dict}
+    return_type : {list, dict, ColumnTable}
         Type to return. If 'list', column names and rows will be returned 
         as list of lists. If 'dict', column names will be keys and rows 
-        will be values of an OrderedDict.
+        will be values of an OrderedDict. If ColumnTable, a 
+        :class:`analysis_tools.tables.columntable.ColumnTable` of the 
+        columns as arrays, which are views unless 'copy' is True.
     include_meta : {True, False}
         Set to True to return the meta data as additional list (if list
         'return_type' selected) or key-value (if dict 'return_type' 
-        selected).
+        selected). Not used for the ColumnTable 'return_type'.
+    copy : {True, False}
+        If True, each column is a list, copied item by item. If False, 
+        each column is a NumPy view of the Table's own column buffer, 
+        which costs nothing per row; changing it changes the Table.
+    lazy : {True, False}
+        Only for the dict 'return_type'. If True, returns a 
+        :class:`LazyColumnDict` that converts each column the first time 
+        it is looked up, so unused columns cost nothing.
 
     Returns
     -------
@@ -49,22 +68,28 @@ def decompose_table(tab, return_type=list, include_meta=False):
         print("input for parameter 'tab' must be an astropy table.Table")
 
     else:
-        if return_type == list:
+        if return_type is ColumnTable:
+            return ColumnTable.from_table(tab, copy=copy)
+
+        elif return_type == list:
             master_list = []
 
             for colname in colnames:
-                master_list.append(list(tab[colname].data))
+                master_list.append(_column(tab, colname, copy))
 
             if include_meta:
                  return [colnames, master_list, tab.meta]
             else:
                  return [colnames, master_list]
 
+        elif return_type == dict and lazy:
+            return LazyColumnDict(tab, copy=copy, include_meta=include_meta)
+
         elif return_type == dict:
             master_dict = OrderedDict()
             
             for colname in colnames:
-                master_dict[colname] = list(tab[colname].data)
+                master_dict[colname] = _column(tab, colname, copy)
             
             if include_meta:
                 master_dict['meta'] = tab.meta
@@ -74,23 +99,99 @@ def decompose_table(tab, return_type=list, include_meta=False):
 
 #-----------------------------------------------------------------------------#
 
-def build_table(columns, colnames, *args, **kwargs): 
+def _column(tab, colname, copy=True):
+    """ Returns a column of a Table as a list, or if 'copy' is False, as
+    a view of its data.
+    """
+    data = tab[colname].data
+    if copy:
+        return list(data)
+    return data
+
+
+#-----------------------------------------------------------------------------#
+
+class LazyColumnDict(MutableMapping):
+    """ An ordered mapping of the columns of an Astropy Table, like the
+    OrderedDict of :func:`decompose_table`, that converts each column
+    only when it is first looked up and then keeps it.
+
+    Parameters
+    ----------
+    tab : Table
+        An Astropy Table of some sort.
+    copy : {True, False}
+        See :func:`decompose_table`.
+    include_meta : {True, False}
+        Set to True to include the meta data under the key 'meta'.
+    """
+
+    def __init__(self, tab, copy=True, include_meta=False):
+        self._tab = tab
+        self._copy = copy
+        self._keys = list(tab.colnames)
+        self._converted = {}
+        if include_meta:
+            self._keys.append('meta')
+            self._converted['meta'] = tab.meta
+
+    def __getitem__(self, key):
+        if key not in self._converted:
+            if key not in self._keys:
+                raise KeyError(key)
+            self._converted[key] = _column(self._tab, key, self._copy)
+        return self._converted[key]
+
+    def __setitem__(self, key, value):
+        if key not in self._keys:
+            self._keys.append(key)
+        self._converted[key] = value
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        self._keys.remove(key)
+        self._converted.pop(key, None)
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __repr__(self):
+        return '{}({}, converted={})'.format(type(self).__name__, 
+            self._keys, [key for key in self._keys if key in self._converted])
+
+
+#-----------------------------------------------------------------------------#
+
+def build_table(columns, colnames=None, *args, **kwargs): 
     """
     A one-line function to build a non-complicated Table.
     Primarily written because I can never remember 'names' parameter.
 
     Parameters
     ----------
-    columns : list of lists
+    columns : list of lists or ColumnTable
         The lists are the columns corresponding to the column names.
     colnames : list
-        The names of the columns.
+        The names of the columns. Optional for a ColumnTable, whose 
+        names are used by default.
 
     Returns
     -------
     tab : Table
         Sparkly new Astropy Table.
     """
+    if isinstance(columns, ColumnTable):
+        if colnames is None:
+            colnames = columns.names
+        columns = columns.columns
+
     tab = Table(columns, names=colnames, *args, **kwargs)
 
     return tab
@@ -98,7 +199,90 @@ def build_table(columns, colnames, *args, **kwargs):
 
 #-----------------------------------------------------------------------------#
 
-def antitable(func):
+def build_table_from_chunks(chunks, colnames, dtypes=None, capacity=1024, 
+    **kwargs):
+    """
+    Builds a Table in one pass from batches of columns, e.g., coming out 
+    of a generator or :func:`analysis_tools.io.readcol.readcol_iter`, 
+    without first gathering them into lists.
+
+    The batches are copied into arrays that grow geometrically and are 
+    trimmed in place at the end, then handed to the Table uncopied.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Each item is a list of columns (lists or arrays), one for each 
+        column name, all the same length, or a ColumnTable.
+    colnames : list
+        The names of the columns.
+    dtypes : list
+        The type of each column. By default, the types of the first batch.
+        A column is promoted if a later batch needs a wider type, e.g., 
+        floats after ints or longer strings.
+    capacity : int
+        Number of rows to allocate to begin with.
+
+    Returns
+    -------
+    tab : Table
+        Sparkly new Astropy Table.
+    """
+    arrays = None
+    nrows = 0
+
+    for chunk in chunks:
+        if isinstance(chunk, ColumnTable):
+            chunk = chunk.columns
+        chunk = [np.asarray(col) for col in chunk]
+        if len(chunk) != len(colnames):
+            raise ValueError("Batch has {} columns, but there are {} names."\
+                .format(len(chunk), len(colnames)))
+        n = len(chunk[0])
+        if not all(len(col) == n for col in chunk):
+            raise ValueError("Columns of batch not all same length.")
+
+        if arrays is None:
+            if dtypes is None:
+                dtypes = [col.dtype for col in chunk]
+            arrays = [np.empty(max(capacity, n), dtype=dtype) 
+                for dtype in dtypes]
+
+        # Double the room until the batch fits.
+        size = max(len(arrays[0]), 1)
+        while nrows + n > size:
+            size *= 2
+        if size > len(arrays[0]):
+            for arr in arrays:
+                arr.resize((size,), refcheck=False)
+
+        for j, col in enumerate(chunk):
+            arr = arrays[j]
+            try:
+                dtype = np.result_type(arr.dtype, col.dtype)
+            except TypeError:
+                raise ValueError("Batch type {} of column {} does not mix with {}."\
+                    .format(col.dtype, colnames[j], arr.dtype))
+            if dtype != arr.dtype:
+                arrays[j] = arr = arr.astype(dtype)
+            arr[nrows:nrows+n] = col
+        nrows += n
+
+    if arrays is None:
+        arrays = [np.empty(0, dtype=dtype) 
+            for dtype in (dtypes or [float]*len(colnames))]
+
+    for arr in arrays:
+        arr.resize((nrows,), refcheck=False)
+
+    tab = Table(arrays, names=colnames, copy=False, **kwargs)
+
+    return tab
+
+
+#-----------------------------------------------------------------------------#
+
+def antitable(func=None, copy=True, lazy=False):
     """ Decorator to be placed before any function that returns an Astropy
     Table, using :func:`decompose_table`. Will convert that table 
     into an OrderedDict.
@@ -109,10 +293,22 @@ def antitable(func):
         out = function_creating_table(args)
         # 'out' is an OrderedDict
 
+        @antitable(copy=False)
+        out = function_creating_table(args)
+        # 'out' is an OrderedDict of views of the table's columns
+
+        @antitable(lazy=True)
+        out = function_creating_table(args)
+        # 'out' is a LazyColumnDict, converting columns as they are used
+
     Parameters
     ----------
     func : function
         The orginal function. Must return an Astropy Table.
+    copy : {True, False}
+        See :func:`decompose_table`. True by default.
+    lazy : {True, False}
+        See :func:`decompose_table`. False by default.
 
     Returns
     -------
@@ -120,10 +316,14 @@ def antitable(func):
         The wrapped function, now returning an OrderedDict where once it 
         returned an Astropy Table.
     """
+    # Called with options, as in @antitable(copy=False).
+    if func is None:
+        return functools.partial(antitable, copy=copy, lazy=lazy)
+
+    @functools.wraps(func)
     def func_wrapper(*args, **kwargs):
         tab = func(*args, **kwargs)
-        ordered_dict = decompose_table(tab, return_type=dict)
+        ordered_dict = decompose_table(tab, return_type=dict, copy=copy, 
+            lazy=lazy)
         return ordered_dict
     return func_wrapper
-
-
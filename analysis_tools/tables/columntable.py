@@ -0,0 +1,183 @@
+"""
+Module for a lightweight table of NumPy columns, to pass data between
+:func:`analysis_tools.io.readcol.readcol`,
+:func:`analysis_tools.io.writecol.writecol` and the Astropy Table
+bypassers of :mod:`analysis_tools.tables.bypass_table` without turning
+every value into a Python object.
+
+Author:
+
+    C.M. Gosmeyer
+
+
+"""
+
+from __future__ import print_function
+import numpy as np
+
+
+#-----------------------------------------------------------------------------#
+
+class ColumnTable(object):
+    """ Named columns of equal length, each a NumPy array.
+
+    Use
+    ---
+        ct = ColumnTable([[1, 2, 3], [.1, .2, .3]], names=['x', 'y'])
+        ct['x']          # the 'x' column, array([1, 2, 3])
+        ct[0]            # the first row, (1, 0.1)
+        ct[1:]           # a ColumnTable of views of the last two rows
+        ct[ct['x'] > 1]  # a ColumnTable of the rows where x > 1
+
+    Parameters
+    ----------
+    columns : list of lists or arrays
+        The columns, all the same length. Arrays are not copied.
+    names : list of str
+        The names of the columns. By default, string numbers starting
+        at '0', as for a file without a header in :func:`readcol`.
+    """
+
+    __slots__ = ('_names', '_columns', '_index')
+
+    def __init__(self, columns, names=None):
+        columns = [np.asarray(col) for col in columns]
+        if names is None:
+            names = [str(j) for j in range(len(columns))]
+        names = list(names)
+
+        if len(names) != len(columns):
+            raise ValueError("Length of names, {}, does not match number of columns, {}."\
+                .format(len(names), len(columns)))
+        if not all(len(col) == len(columns[0]) for col in columns):
+            raise ValueError("Columns not all same length.")
+
+        self._names = names
+        self._columns = columns
+        self._index = dict((name, j) for j, name in enumerate(names))
+
+    @property
+    def names(self):
+        """ The column names, as a list. """
+        return list(self._names)
+
+    @property
+    def columns(self):
+        """ The columns, as a list of arrays. """
+        return list(self._columns)
+
+    def __len__(self):
+        if self._columns == []:
+            return 0
+        return len(self._columns[0])
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def keys(self):
+        return self.names
+
+    def values(self):
+        return self.columns
+
+    def items(self):
+        return list(zip(self._names, self._columns))
+
+    def __getitem__(self, key):
+        """ A column by name, a row (as a tuple) by number, or a new
+        ColumnTable by slice, index array, boolean mask or list of names.
+        """
+        if isinstance(key, str):
+            return self._columns[self._index[key]]
+        if isinstance(key, (int, np.integer)):
+            return tuple(col[key] for col in self._columns)
+        if isinstance(key, list) and all(isinstance(k, str) for k in key):
+            return ColumnTable([self[name] for name in key], names=key)
+        return ColumnTable([col[key] for col in self._columns],
+            names=self._names)
+
+    def __setitem__(self, name, col):
+        """ Adds or replaces a column. """
+        col = np.asarray(col)
+        if self._columns != [] and len(col) != len(self):
+            raise ValueError("Column length, {}, does not match {}."\
+                .format(len(col), len(self)))
+        if name in self._index:
+            self._columns[self._index[name]] = col
+        else:
+            self._index[name] = len(self._names)
+            self._names.append(name)
+            self._columns.append(col)
+
+    def __repr__(self):
+        return '{}(names={}, nrows={})'.format(type(self).__name__,
+            self._names, len(self))
+
+    def row(self, i):
+        """ Returns row 'i' as a tuple. """
+        return self[int(i)]
+
+    @classmethod
+    def concatenate(cls, tables):
+        """ Joins the rows of ColumnTables with the same names, allocating
+        each column once.
+
+        Parameters
+        ----------
+        tables : list of ColumnTable
+            The tables, in order.
+
+        Returns
+        -------
+        ct : ColumnTable
+            All the rows.
+        """
+        tables = list(tables)
+        names = tables[0].names
+        for table in tables[1:]:
+            if table.names != names:
+                raise ValueError("Names {} do not match {}."\
+                    .format(table.names, names))
+        columns = [np.concatenate([table._columns[j] for table in tables])
+            for j in range(len(names))]
+
+        return cls(columns, names=names)
+
+    @classmethod
+    def from_table(cls, tab, copy=False):
+        """ Makes a ColumnTable of the columns of an Astropy Table.
+
+        Parameters
+        ----------
+        tab : Table
+            An Astropy Table of some sort.
+        copy : {True, False}
+            If False, the columns are views of the Table's data.
+
+        Returns
+        -------
+        ct : ColumnTable
+        """
+        columns = [tab[name].data for name in tab.colnames]
+        if copy:
+            columns = [np.array(col) for col in columns]
+
+        return cls(columns, names=tab.colnames)
+
+    def to_table(self, copy=False):
+        """ Makes an Astropy Table of the columns.
+
+        Parameters
+        ----------
+        copy : {True, False}
+            If False, the Table uses the columns' arrays.
+
+        Returns
+        -------
+        tab : Table
+        """
+        from astropy.table import Table
+        return Table(self._columns, names=self._names, copy=copy)
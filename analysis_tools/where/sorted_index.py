@@ -0,0 +1,189 @@
+"""
+Module for answering many where searches on the same array, sorting it
+once so that each search is a binary search rather than a full pass.
+
+"""
+
+from __future__ import print_function
+import numpy as np
+
+
+#-----------------------------------------------------------------------------#
+
+class SortedIndex(object):
+    """ Sorts an array once, then answers range and equality tests on it
+    in O(log n + k) for k matches, with the same output as
+    :func:`analysis_tools.where.where.andwhere`.
+
+    Use
+    ---
+        index = SortedIndex(mags)
+        for low, high in cuts:
+            bright = index.andwhere(low, '>', high, '<', return_indices=True)
+
+    Parameters
+    ----------
+    data : list or array
+        One-dimensional data. Arrays are not copied, so the index goes
+        stale if 'data' is changed afterwards.
+    """
+
+    def __init__(self, data):
+        self.data = np.asarray(data)
+        self._order = np.argsort(self.data, kind='stable')
+        self._sorted = self.data[self._order]
+
+        # NaNs sort to the end and never pass a test.
+        self._nvalid = len(self._sorted)
+        if self._sorted.dtype.kind in 'fc':
+            self._nvalid -= np.count_nonzero(np.isnan(self._sorted))
+
+    def __len__(self):
+        return len(self.data)
+
+    def andwhere(self, val1, test1, val2=None, test2=None,
+        return_indices=False, ordered=True):
+        """ As :func:`analysis_tools.where.where.andwhere`.
+
+        Parameters
+        ----------
+        val1, test1, val2, test2 :
+            As for andwhere. Tests are '<', '>', '<=', '>=', '==', or
+            'between', for which the value is (low, high).
+        return_indices : {True, False}
+            As for andwhere.
+        ordered : {True, False}
+            If True, results are in the order of 'data', as from
+            andwhere, which costs a sort of the k results. If False,
+            they are in order of value, and values are returned as a
+            view with no copying at all.
+
+        Returns
+        -------
+        As for andwhere.
+        """
+        tests = [(test1, val1)]
+        if val2 is not None or test2 is not None:
+            tests.append((test2, val2))
+
+        return self.where_all(tests, return_indices=return_indices,
+            ordered=ordered)
+
+    def where_all(self, tests, return_indices=False, ordered=True):
+        """ As :func:`analysis_tools.where.where.where_all`, except that
+        '!=' is not supported.
+
+        Parameters
+        ----------
+        tests : list of tuples
+            Each is (test, value).
+        return_indices : {True, False}
+            As for where_all.
+        ordered : {True, False}
+            See :meth:`andwhere`.
+
+        Returns
+        -------
+        As for where_all.
+        """
+        start, stop = self.bounds(tests)
+
+        if return_indices:
+            indices = self._order[start:stop]
+            if ordered:
+                indices = np.sort(indices)
+            return indices
+        else:
+            if ordered:
+                return self.data[np.sort(self._order[start:stop])]
+            return self._sorted[start:stop]
+
+    def windows(self, windows, closed='left', return_counts=False):
+        """ Finds the entries falling in each of many (low, high) windows
+        at once. See :func:`analysis_tools.where.where.where_windows`.
+        """
+        windows = np.asarray(windows).reshape(-1, 2)
+        if closed not in ('left', 'right', 'both', 'neither'):
+            raise ValueError("Invalid closed, {}".format(closed))
+        low_side = 'left' if closed in ('left', 'both') else 'right'
+        high_side = 'right' if closed in ('right', 'both') else 'left'
+
+        valid = self._sorted[:self._nvalid]
+        starts = np.searchsorted(valid, windows[:, 0], side=low_side)
+        stops = np.searchsorted(valid, windows[:, 1], side=high_side)
+        counts = np.maximum(stops - starts, 0)
+        if return_counts:
+            return counts
+
+        offsets = np.zeros(len(counts)+1, dtype=np.intp)
+        np.cumsum(counts, out=offsets[1:])
+
+        # Sorted positions of every window's entries, laid end to end.
+        window_ids = np.repeat(np.arange(len(counts)), counts)
+        positions = np.arange(offsets[-1]) - offsets[window_ids] \
+            + starts[window_ids]
+        indices = self._order[positions]
+
+        # Put each window's indices in the order of 'data'.
+        indices = indices[np.lexsort((indices, window_ids))]
+
+        return offsets, indices
+
+    def count(self, tests):
+        """ Returns the number of entries passing all of 'tests', in
+        O(log n).
+        """
+        start, stop = self.bounds(tests)
+        return stop - start
+
+    def bounds(self, tests):
+        """ Returns the slice of the sorted data passing all of 'tests'.
+
+        Parameters
+        ----------
+        tests : list of tuples
+            Each is (test, value).
+
+        Returns
+        -------
+        start, stop : int
+            Sorted positions of the first passing entry and one past the
+            last.
+        """
+        start, stop = 0, self._nvalid
+        for test, val in tests:
+            low, high = self._test_bounds(test, val)
+            start = max(start, low)
+            stop = min(stop, high)
+
+        return start, max(start, stop)
+
+    def _test_bounds(self, test, val):
+        """ Returns the slice of the sorted data passing one test.
+        """
+        # Nothing compares true against NaN.
+        if any(v != v for v in (val if test == 'between' else [val])):
+            return 0, 0
+
+        if test == 'between':
+            low, high = val
+            return (self._search(low, 'left'), self._search(high, 'right'))
+        elif test == '<':
+            return 0, self._search(val, 'left')
+        elif test == '<=':
+            return 0, self._search(val, 'right')
+        elif test == '>':
+            return self._search(val, 'right'), self._nvalid
+        elif test == '>=':
+            return self._search(val, 'left'), self._nvalid
+        elif test == '==':
+            return self._search(val, 'left'), self._search(val, 'right')
+        elif test == '!=':
+            raise ValueError("'!=' does not select one range of values; "
+                "use where.where_all.")
+        else:
+            raise ValueError("Invalid equality check, {}".format(test))
+
+    def _search(self, val, side):
+        return int(np.searchsorted(self._sorted[:self._nvalid], val,
+            side=side))
@@ -4,8 +4,19 @@ Modules for numpy.where to make it more IDL-like.
 """
 
 from __future__ import print_function
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 
+from analysis_tools.tables.columntable import ColumnTable
+from analysis_tools.where.sorted_index import SortedIndex
+
+# The tests the where functions understand, besides 'between'.
+_TESTS = {'<': np.less, '>': np.greater, '<=': np.less_equal, 
+    '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal}
+
+#-----------------------------------------------------------------------------#
+
 def andwhere(data, val1, test1, val2=None, test2=None, return_indices=False):
     """ Performs an 'and' where search, i.e., where(input > 3 and input < 4).
     Using the parameter names, where(data test1 val1 and data test2 val2).
@@ -27,11 +38,11 @@ def andwhere(data, val1, test1, val2=None, test2=None, return_indices=False):
     val1 : int, float, or str
         First value you wish to check 'data' against.
     test1 : str
-        Either '<', '>', '<=', '>=', or '=='.
+        Either '<', '>', '<=', '>=', '==', or '!='.
     val2 :
         Second value you wish to check 'data' against.
     test2 : str
-        Either '<', '>', '<=', '>=', or '=='.
+        Either '<', '>', '<=', '>=', '==', or '!='.
     return_indices : {True, False}
         If True, returns only the indices of valid 'data' entries. If
         False, returns only the values of 'data' corresponding to those
@@ -47,53 +58,396 @@ def andwhere(data, val1, test1, val2=None, test2=None, return_indices=False):
         testing parameters.
 
     """
-    # Transform the list to numpy array.
-    data = np.array(data)
-
-    # Transform the first equality tests.
-    if test1 == '<':
-        indices1 = np.where(data < val1)[0]
-    elif test1 == '>':
-        indices1 = np.where(data > val1)[0]     
-    elif test1 == '<=':
-        indices1 = np.where(data <= val1)[0]    
-    elif test1 == '>=':
-        indices1 = np.where(data >= val1)[0]   
-    elif test1 == '==':
-        indices1 = np.where(data >= val1)[0]        
+    tests = [(test1, val1)]
+
+    # If a second check was entered, add it.
+    if val2 is not None or test2 is not None:
+        tests.append((test2, val2))
+
+    return where_all(data, tests, return_indices=return_indices)
+
+
+#-----------------------------------------------------------------------------#
+
+def where_all(data, tests, return_indices=False):
+    """ Performs an 'and' where search over any number of tests, i.e., 
+    where(input > 3 and input < 4 and input != 3.5), building one mask
+    in place. A faster, general :func:`andwhere`.
+
+    Example
+    -------
+    > where_all([1, 2, 3, 4], [('>', 1), ('!=', 3), ('between', (0, 3))])
+    array([2])
+
+    Parameters
+    ----------
+    data : list or array
+        Arrays, including memory-mapped ones, are not copied.
+    tests : list of tuples
+        Each is (test, value), test being '<', '>', '<=', '>=', '==', 
+        '!=', or 'between', for which value is (low, high) and both ends
+        are included.
+    return_indices : {True, False}
+        If True, returns only the indices of valid 'data' entries. If
+        False, returns only the values of 'data' corresponding to those
+        entries.
+
+    Returns
+    -------
+    If 'return_indices' is False,
+    data_cut : array
+        The 'data' array cut down by the tests.
+    If 'return_indices' is True:
+        The index array of 'data' corresponding to items cut down by the
+        tests.
+    """
+    data = np.asarray(data)
+    mask = _mask(data, tests, np.logical_and)
+
+    if return_indices:
+        return np.flatnonzero(mask)
     else:
-        print("Invalid equality check, {}".format(test1))
+        return data[mask]
 
-    data_cut1 = data[indices1]
-     
-    # If only one equality check entered, finish. 
-    if val2 == None and test2 == None:
-        if return_indices:
-            return indices1
-        else:
-            return data_cut1
-    
-    # If a second check was entered, continue
-
-    # Transform the second equality tests.
-    if test2 == '<':
-        indices2 = np.where(data_cut1 < val2)[0]
-    elif test2 == '>':
-        indices2 = np.where(data_cut1 > val2)[0]    
-    elif test2 == '<=':
-        indices2 = np.where(data_cut1 <= val2)[0]       
-    elif test2 == '>=':
-        indices2 = np.where(data_cut1 >= val2)[0]   
-    elif test2 == '==':
-        indices2 = np.where(data_cut1 >= val2)[0]           
+
+#-----------------------------------------------------------------------------#
+
+def where_any(data, tests, return_indices=False):
+    """ Performs an 'or' where search over any number of tests, i.e., 
+    where(input < 3 or input > 4), building one mask in place.
+
+    Parameters
+    ----------
+    data : list or array
+        Arrays, including memory-mapped ones, are not copied.
+    tests : list of tuples
+        As for :func:`where_all`.
+    return_indices : {True, False}
+        As for :func:`where_all`.
+
+    Returns
+    -------
+    As for :func:`where_all`.
+    """
+    data = np.asarray(data)
+    mask = _mask(data, tests, np.logical_or)
+
+    if return_indices:
+        return np.flatnonzero(mask)
     else:
-        print("Invalid equality check, {}".format(test2))
+        return data[mask]
+
+
+#-----------------------------------------------------------------------------#
+
+def where_table(columns, spec, return_indices=False):
+    """ Performs an 'and' where search over several columns at once, i.e., 
+    where(mag < 22 and chi2 < 3 and flag == 0), building one mask.
+
+    Example
+    -------
+    > cut = where_table(readcol('phot.txt'), 
+    >     {'mag': ('<', 22), 'chi2': ('<', 3), 'flag': ('==', 0)})
+
+    Parameters
+    ----------
+    columns : dict, Table, ColumnTable, or tuple
+        The columns by name: a dict (e.g., from 
+        :func:`analysis_tools.tables.bypass_table.decompose_table`), an
+        Astropy Table, a ColumnTable, or the (header, cols) returned by
+        :func:`analysis_tools.io.readcol.readcol`. Columns of strings are
+        compared as floats unless the test value is a str.
+    spec : dict
+        Maps column names to a test, e.g., ('<', 22), or a list of tests,
+        each as for :func:`where_all`.
+    return_indices : {True, False}
+        If True, returns only the indices of the rows passing every test.
+        If False, returns 'columns' cut down to those rows.
+
+    Returns
+    -------
+    If 'return_indices' is False,
+    columns_cut : same type as 'columns'
+        The rows passing every test. A dict comes back as an OrderedDict
+        of arrays.
+    If 'return_indices' is True:
+        The index array of those rows.
+    """
+    if isinstance(columns, tuple):
+        header, cols = columns
+        lookup = dict(zip(header, cols))
+    else:
+        lookup = columns
+    if hasattr(lookup, 'colnames'):
+        names = lookup.colnames
+    else:
+        names = list(lookup.keys())
+
+    mask = None
+    scratch = [None, None]
+    for name, tests in spec.items():
+        if name not in names:
+            raise ValueError("No column {}.".format(name))
+        data = np.asarray(lookup[name])
+        if isinstance(tests, tuple):
+            tests = [tests]
+        if data.dtype.kind in 'US' and not all(isinstance(val, str) 
+            for test, val in tests):
+            data = data.astype(float)
+        if mask is None:
+            mask = np.ones(data.shape, dtype=bool)
+        mask = _mask(data, tests, np.logical_and, mask=mask, scratch=scratch)
+
+    if mask is None:
+        # No tests, so every row passes.
+        mask = np.ones(_nrows(columns), dtype=bool)
 
-    data_cut2 = data_cut1[indices2]
-    
     if return_indices:
-        # Returns the first indices because those correspond to 
-        # the original input array.
-        return indices1[indices2]
+        return np.flatnonzero(mask)
+
+    if isinstance(columns, tuple):
+        return header, [np.asarray(col)[mask] for col in cols]
+    elif isinstance(columns, ColumnTable) or hasattr(columns, 'colnames'):
+        return columns[mask]
+    else:
+        nrows = len(mask)
+        return OrderedDict((name, np.asarray(value)[mask] 
+            if _is_column(value, nrows) else value) 
+            for name, value in columns.items())
+
+
+#-----------------------------------------------------------------------------#
+
+def _nrows(columns):
+    """ Returns the number of rows of the columns given to 
+    :func:`where_table`.
+    """
+    if isinstance(columns, tuple):
+        cols = columns[1]
+    elif isinstance(columns, ColumnTable) or hasattr(columns, 'colnames'):
+        return len(columns)
+    else:
+        cols = [value for value in columns.values() if _is_column(value)]
+    return len(cols[0]) if cols else 0
+
+
+def _is_column(value, nrows=None):
+    """ Whether a dict value is a column rather than, e.g., meta data.
+    """
+    if isinstance(value, (dict, str)) or not hasattr(value, '__len__'):
+        return False
+    return nrows is None or len(value) == nrows
+
+
+#-----------------------------------------------------------------------------#
+
+def where_chunked(data, tests, chunksize=2**20, return_indices=False, 
+    combine='all', workers=None):
+    """ As :func:`where_all` (or :func:`where_any`), but walks the data 
+    in blocks of 'chunksize' entries, so that a memory-mapped or on-disk
+    array much larger than memory can be searched. Only a block's worth 
+    of masks (per worker) is held at a time, besides the results.
+
+    Use
+    ---
+        mags = np.load('mags.npy', mmap_mode='r')
+        faint = where_chunked(mags, [('>', 22)], return_indices=True)
+
+    Parameters
+    ----------
+    data : list, array, or str
+        The data, flattened (in C order) if not one-dimensional. Arrays,
+        including np.memmap, are not copied; blocks of rows along the
+        first axis are flattened one at a time, so only a block is ever
+        copied if the array is not C-contiguous. A str is taken as the 
+        name of a '.npy' file, which is memory-mapped.
+    tests : list of tuples
+        As for :func:`where_all`.
+    chunksize : int
+        Number of entries tested at once. If 'data' has more than one 
+        dimension, as many whole rows as fit, but at least one.
+    return_indices : {True, False}
+        As for :func:`where_all`.
+    combine : {'all', 'any'}
+        Whether entries must pass all of 'tests' or any of them.
+    workers : int
+        Number of threads testing blocks at once. By default, blocks are
+        tested one after the other, reusing the same masks.
+
+    Returns
+    -------
+    As for :func:`where_all`, in the order of 'data'.
+    """
+    if isinstance(data, str):
+        data = np.load(data, mmap_mode='r')
+    data = np.asarray(data)
+    if data.ndim == 0:
+        data = data.reshape(1)
+
+    if combine not in ('all', 'any'):
+        raise ValueError("Invalid combine, {}".format(combine))
+    combine = np.logical_and if combine == 'all' else np.logical_or
+
+    # Blocks are whole rows of the first axis.
+    rowsize = int(np.prod(data.shape[1:]))
+    nrows = max(1, chunksize // max(rowsize, 1))
+    starts = range(0, len(data) if data.size else 0, nrows)
+
+    def search_block(start, mask=None, scratch=None):
+        block = data[start:start+nrows].reshape(-1)
+        if mask is not None:
+            mask = mask[:len(block)]
+            mask.fill(combine is np.logical_and)
+            scratch = [buf[:len(block)] for buf in scratch]
+        mask = _mask(block, tests, combine, mask=mask, scratch=scratch)
+        if return_indices:
+            return np.flatnonzero(mask) + start * rowsize
+        return block[mask]
+
+    if workers is None:
+        size = min(nrows * rowsize, data.size)
+        mask = np.empty(size, dtype=bool)
+        scratch = [np.empty(size, dtype=bool), np.empty(size, dtype=bool)]
+        results = [search_block(start, mask, scratch) for start in starts]
     else:
-        return data_cut2
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(search_block, starts))
+
+    if results == []:
+        return np.array([], dtype=np.intp if return_indices else data.dtype)
+
+    return np.concatenate(results)
+
+
+#-----------------------------------------------------------------------------#
+
+def where_bins(data, edges, return_counts=False):
+    """ Sorts the entries of 'data' into bins in one pass, rather than 
+    one :func:`andwhere` per bin. As in np.histogram, bins include their
+    low edge, and the last bin also includes its high edge.
+
+    Example
+    -------
+    > offsets, indices = where_bins([5, 1, 4, 2], [0, 3, 6])
+    > indices[offsets[0]:offsets[1]]  # indices in the first bin
+    array([1, 3])
+    > indices[offsets[1]:offsets[2]]  # indices in the second bin
+    array([0, 2])
+
+    Parameters
+    ----------
+    data : list or array
+        One-dimensional data. Arrays are not copied.
+    edges : list or array
+        The bin edges, increasing.
+    return_counts : {True, False}
+        If True, returns only the number of entries in each bin.
+
+    Returns
+    -------
+    If 'return_counts' is False,
+    offsets : array
+        The indices of bin b are indices[offsets[b]:offsets[b+1]].
+    indices : array
+        The indices of 'data' in each bin, bin after bin, each bin's in
+        increasing order.
+    If 'return_counts' is True,
+    counts : array
+        The number of entries in each bin.
+    """
+    data = np.asarray(data)
+    edges = np.asarray(edges)
+    nbins = len(edges) - 1
+
+    bins = np.searchsorted(edges, data, side='right') - 1
+    # The last bin is closed.
+    bins[data == edges[-1]] = nbins - 1
+    inside = (bins >= 0) & (bins < nbins)
+    bins = bins[inside]
+
+    counts = np.bincount(bins, minlength=nbins)
+    if return_counts:
+        return counts
+
+    offsets = np.zeros(nbins+1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+    indices = np.flatnonzero(inside)[np.argsort(bins, kind='stable')]
+
+    return offsets, indices
+
+
+#-----------------------------------------------------------------------------#
+
+def where_windows(data, windows, closed='left', return_counts=False):
+    """ Finds the entries of 'data' in each of many (low, high) windows, 
+    which may overlap, sorting 'data' once rather than doing one 
+    :func:`andwhere` per window.
+
+    Parameters
+    ----------
+    data : list, array, or SortedIndex
+        One-dimensional data. Pass a 
+        :class:`analysis_tools.where.sorted_index.SortedIndex` to reuse
+        its sort.
+    windows : list of tuples
+        The (low, high) of each window.
+    closed : {'left', 'right', 'both', 'neither'}
+        Which ends of the windows are included. 'left', by default, is
+        low <= data < high.
+    return_counts : {True, False}
+        If True, returns only the number of entries in each window.
+
+    Returns
+    -------
+    As for :func:`where_bins`, with windows in place of bins.
+    """
+    if not isinstance(data, SortedIndex):
+        data = SortedIndex(data)
+
+    return data.windows(windows, closed=closed, return_counts=return_counts)
+
+
+#-----------------------------------------------------------------------------#
+
+def _mask(data, tests, combine, mask=None, scratch=None):
+    """ Evaluates tests on 'data' into one boolean mask, reusing two 
+    scratch buffers rather than allocating an array per test.
+
+    Parameters
+    ----------
+    data : array
+        The data to test.
+    tests : list of tuples
+        As for :func:`where_all`.
+    combine : ufunc
+        np.logical_and or np.logical_or.
+    mask : array
+        Optional. Boolean array the shape of 'data' to fill. If it is
+        given, its contents are combined with the tests.
+    scratch : list of arrays
+        Optional. Two boolean arrays the shape of 'data' to work in.
+
+    Returns
+    -------
+    mask : array
+        The combined result of the tests.
+    """
+    if scratch is None:
+        scratch = [None, None]
+    if mask is None:
+        mask = np.empty(data.shape, dtype=bool)
+        mask.fill(combine is np.logical_and)
+
+    for test, val in tests:
+        if test == 'between':
+            low, high = val
+            scratch[0] = np.greater_equal(data, low, out=scratch[0])
+            scratch[1] = np.less_equal(data, high, out=scratch[1])
+            np.logical_and(scratch[0], scratch[1], out=scratch[0])
+        elif test in _TESTS:
+            scratch[0] = _TESTS[test](data, val, out=scratch[0])
+        else:
+            raise ValueError("Invalid equality check, {}".format(test))
+        combine(mask, scratch[0], out=mask)
+
+    return mask
@@ -0,0 +1,16 @@
+"""
+Test data shared by the nose tests of the sigma-clipping modules in
+`analysis_tools.statistics`.
+"""
+
+from __future__ import print_function
+
+import numpy as np
+
+
+def noisy_data(shape, seed=0):
+    """ Gaussian noise about 10 with a few strong outliers. """
+    rng = np.random.RandomState(seed)
+    data = rng.normal(10., 1., size=shape)
+    data[rng.uniform(size=shape) < 0.05] += 50.
+    return data
@@ -0,0 +1,71 @@
+"""
+Nose tests for Astropy Table bypassers, `analysis_tools.tables.bypass_table`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.tables.bypass_table import decompose_table
+from analysis_tools.tables.bypass_table import build_table
+from analysis_tools.tables.bypass_table import build_table_from_chunks
+from analysis_tools.tables.bypass_table import antitable
+from analysis_tools.tables.bypass_table import LazyColumnDict
+from astropy.table import Table
+from collections import OrderedDict
+from nose.tools import *
+
+import numpy as np
+
+
+def make_table():
+    return Table([[1, 2, 3], [.1, .2, .3]], names=['x', 'y'], meta={'a': 1})
+
+def test_decomposes_to_lists():
+    assert decompose_table(make_table()) == [['x', 'y'], [[1, 2, 3], [.1, .2, .3]]]
+    assert decompose_table(make_table(), return_type=dict, include_meta=True) == OrderedDict([('x', [1, 2, 3]), ('y', [.1, .2, .3]), ('meta', {'a': 1})])
+
+def test_decomposes_to_views_without_copy():
+    tab = make_table()
+    colnames, cols = decompose_table(tab, copy=False)
+    assert isinstance(cols[0], np.ndarray)
+    cols[0][0] = 10
+    assert tab['x'][0] == 10
+
+def test_antitable_with_and_without_options():
+    assert antitable(make_table)() == OrderedDict([('x', [1, 2, 3]), ('y', [.1, .2, .3])])
+    out = antitable(copy=False)(make_table)()
+    assert isinstance(out['x'], np.ndarray) and list(out['x']) == [1, 2, 3]
+
+def test_lazy_dict_converts_columns_on_first_use():
+    out = antitable(lazy=True)(make_table)()
+    assert isinstance(out, LazyColumnDict)
+    assert list(out.keys()) == ['x', 'y']
+    assert out._converted == {}
+    assert out['y'] == [.1, .2, .3]
+    assert list(out._converted.keys()) == ['y']
+    assert out['y'] is out['y']
+    assert dict(decompose_table(make_table(), return_type=dict, include_meta=True, lazy=True)) == dict(decompose_table(make_table(), return_type=dict, include_meta=True))
+
+def test_builds_table_and_decomposes_back():
+    tab = build_table([[1, 2, 3], [.1, .2, .3]], ['x', 'y'])
+    assert tab.colnames == ['x', 'y']
+    assert decompose_table(tab) == [['x', 'y'], [[1, 2, 3], [.1, .2, .3]]]
+
+def test_builds_table_from_chunks():
+    chunks = ([np.arange(i*3, i*3+3), ['s'*(i+1)]*3] for i in range(5))
+    tab = build_table_from_chunks(chunks, ['a', 'b'], capacity=2)
+    assert tab.colnames == ['a', 'b']
+    assert list(tab['a']) == list(range(15))
+    assert list(tab['b'][-3:]) == ['sssss']*3
+    assert len(build_table_from_chunks([], ['a', 'b'])) == 0
+    assert_raises(ValueError, build_table_from_chunks, [[[1, 2]]], ['a', 'b'])
+
+def test_build_table_from_chunks_promotes_types():
+    tab = build_table_from_chunks([[[1, 2]], [[3.7]]], ['x'])
+    assert tab['x'].dtype.kind == 'f'
+    assert list(tab['x']) == [1., 2., 3.7]
+    tab = build_table_from_chunks([[[]], [[1, 2, 3]]], ['x'], capacity=0)
+    assert list(tab['x']) == [1, 2, 3]
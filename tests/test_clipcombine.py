@@ -0,0 +1,79 @@
+"""
+Nose tests for combining frames by sigma clipping, 
+`analysis_tools.statistics.clipcombine`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.statistics.clipcombine import clipcombine
+from analysis_tools.statistics.meanclip import meanclip
+from clip_data import noisy_data
+from astropy.io import fits
+from nose.tools import *
+
+import numpy as np
+import os
+
+
+def make_frames(nframes, shape, seed=0):
+    """ Writes FITS frames of Gaussian noise about 10 with a few strong
+    outliers to a SCI extension, returning their names and the stack. """
+    stack = noisy_data((nframes,) + shape, seed)
+    files = []
+    for j, frame in enumerate(stack):
+        filename = 'test_clipcombine_{}.fits'.format(j)
+        fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(frame, name='SCI')])\
+            .writeto(filename, overwrite=True)
+        files.append(filename)
+    return files, stack
+
+
+def remove(files):
+    for filename in files:
+        if os.path.isfile(filename):
+            os.remove(filename)
+
+
+def test_clipcombine_matches_meanclip_per_pixel():
+    files, stack = make_frames(15, (11, 7))
+    try:
+        for return_median in (0, 1):
+            combined, reject = clipcombine(files, ext=('SCI', 1),
+                rows_per_block=4, verbose=0, return_median=return_median)
+            assert combined.shape == reject.shape == (11, 7)
+            for i in range(11):
+                for j in range(7):
+                    val, sigma = meanclip(stack[:, i, j], verbose=0,
+                        return_median=return_median)
+                    assert np.isclose(combined[i, j], val)
+                    kept = meanclip(stack[:, i, j], verbose=0, return_array=1)
+                    assert reject[i, j] == 15 - len(kept)
+    finally:
+        remove(files)
+
+
+def test_clipcombine_writes_outfile():
+    files, stack = make_frames(5, (6, 4), seed=1)
+    try:
+        combined, reject = clipcombine(files, verbose=0, 
+            outfile='test_clipcombine_out.fits')
+        with fits.open('test_clipcombine_out.fits') as hdul:
+            assert np.allclose(hdul[0].data, combined)
+            assert np.array_equal(hdul['REJECT'].data, reject)
+            assert hdul[0].header['NCOMBINE'] == 5
+    finally:
+        remove(files + ['test_clipcombine_out.fits'])
+
+
+def test_clipcombine_shape_mismatch():
+    files, stack = make_frames(2, (6, 4), seed=2)
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(np.zeros((5, 4)))])\
+        .writeto(files[1], overwrite=True)
+    try:
+        assert_raises(ValueError, clipcombine, files, verbose=0)
+    finally:
+        remove(files)
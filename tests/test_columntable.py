@@ -0,0 +1,49 @@
+"""
+Nose tests for the array-backed table, `analysis_tools.tables.columntable`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.io.readcol import readcol
+from analysis_tools.io.writecol import writecol
+from analysis_tools.tables.bypass_table import build_table
+from analysis_tools.tables.bypass_table import decompose_table
+from analysis_tools.tables.columntable import ColumnTable
+from nose.tools import *
+
+import numpy as np
+import os
+
+abs_path = os.path.split(os.path.abspath(__file__))[0]
+
+
+def test_looks_up_columns_rows_and_slices():
+    ct = ColumnTable([[1, 2, 3], [.1, .2, .3]], names=['x', 'y'])
+    assert len(ct) == 3 and ct.names == ['x', 'y']
+    assert list(ct['x']) == [1, 2, 3]
+    assert ct[1] == (2, .2)
+    assert list(ct[1:]['y']) == [.2, .3]
+    assert np.shares_memory(ct[1:]['y'], ct['y'])
+    assert list(ct[ct['x'] > 1]['x']) == [2, 3]
+    assert ct[['y']].names == ['y']
+    assert_raises(ValueError, ColumnTable, [[1, 2], [1]])
+
+def test_concatenates():
+    ct = ColumnTable([[1, 2], ['a', 'b']], names=['x', 'y'])
+    both = ColumnTable.concatenate([ct, ct])
+    assert list(both['x']) == [1, 2, 1, 2] and list(both['y']) == ['a', 'b', 'a', 'b']
+
+def test_passes_between_readcol_writecol_and_tables():
+    ct = readcol(filename=os.path.join(abs_path, 'test_files/nominal.txt'), engine='numpy', return_type=ColumnTable)
+    assert ct.names == ['x', 'y'] and list(ct['x']) == [1, 2, 3, 4]
+    tab = build_table(ct)
+    assert tab.colnames == ['x', 'y']
+    assert list(decompose_table(tab, return_type=ColumnTable)['y']) == list(ct['y'])
+    filename = 'test_columntable_write.txt'
+    writecol(filename=filename, data=ct)
+    assert readcol(filename=filename) == (['x', 'y'], [['1', '2', '3', '4'], ['0.1', '0.2', '0.3', '0.4']])
+    os.remove(filename)
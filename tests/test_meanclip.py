@@ -0,0 +1,69 @@
+"""
+Nose tests for sigma clipping, `analysis_tools.statistics.meanclip`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.statistics.meanclip import meanclip
+from clip_data import noisy_data
+from nose.tools import *
+
+import numpy as np
+
+
+def test_axis_matches_meanclip_per_lane():
+    stack = noisy_data((30, 6, 5))
+    val, sigma, niter, count = meanclip(stack, axis=0, verbose=0)
+    assert val.shape == (6, 5)
+    for i in range(6):
+        for j in range(5):
+            lane_val, lane_sigma = meanclip(stack[:, i, j], verbose=0)
+            assert np.isclose(val[i, j], lane_val) and np.isclose(sigma[i, j], lane_sigma)
+            assert count[i, j] == len(meanclip(stack[:, i, j], verbose=0, return_array=1))
+    kept = meanclip(stack, axis=0, verbose=0, return_array=1)
+    assert kept.shape == stack.shape and np.array_equal(kept.sum(axis=0), count)
+
+
+def test_select_method_matches_sort():
+    data = noisy_data(2000, seed=1)
+    for indata in (data, np.round(data).astype(int), data.astype(np.float32)):
+        for return_median in (0, 1):
+            sort = meanclip(indata, verbose=0, return_median=return_median)
+            select = meanclip(indata, verbose=0, return_median=return_median,
+                method='select')
+            assert np.allclose(sort, select, rtol=1e-6)
+        assert np.array_equal(meanclip(indata, verbose=0, return_array=1),
+            meanclip(indata, verbose=0, return_array=1, method='select'))
+
+
+def test_select_float32_inplace_and_out():
+    data = noisy_data((50, 40), seed=2).astype(np.float32)
+    expected = meanclip(data.astype(float), verbose=0)
+    val, sigma, diag = meanclip(data, verbose=0, method='select', 
+        dtype='float32', return_diagnostics=1)
+    assert np.allclose((val, sigma), expected, rtol=1e-5)
+    assert diag['count'] == len(meanclip(data.astype(float), verbose=0, return_array=1))
+    # A float32 work copy and difference buffer, and two masks.
+    assert diag['peak_bytes'] == data.size * (4 + 4 + 1 + 1)
+
+    work = data.copy()
+    inplace = meanclip(work, verbose=0, method='select', dtype='float32',
+        inplace=True, return_diagnostics=1)
+    assert np.allclose(inplace[:2], (val, sigma))
+    assert inplace[2]['peak_bytes'] == data.size * (4 + 1 + 1)
+    assert np.array_equal(np.sort(work, axis=None), np.sort(data, axis=None))
+
+    out = np.empty(data.size + 10, dtype=np.float32)
+    assert np.allclose(meanclip(data, verbose=0, method='select', 
+        dtype='float32', out=out), (val, sigma))
+
+    assert_raises(ValueError, meanclip, data, verbose=0, method='select', 
+        inplace=True)
+    assert_raises(ValueError, meanclip, data.copy(), verbose=0, method='select',
+        dtype='float32', inplace=True, return_array=1)
+    assert_raises(ValueError, meanclip, data, verbose=0, dtype='float32')
+    assert_raises(ValueError, meanclip, data, verbose=0, method='selct')
@@ -0,0 +1,61 @@
+"""
+Nose tests for streaming sigma clipping, 
+`analysis_tools.statistics.meanclip_stream`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.statistics.meanclip import meanclip
+from analysis_tools.statistics.meanclip_stream import meanclip_stream
+from clip_data import noisy_data
+from nose.tools import *
+
+import numpy as np
+import os
+
+
+def test_meanclip_stream_within_error_bound():
+    data = noisy_data(50000)
+    for return_median in (0, 1):
+        exact = meanclip(data, verbose=0, return_median=return_median)
+        val, sigma, error = meanclip_stream(data, verbose=0, 
+            return_median=return_median, nbins=1024, chunksize=4096)
+        # The few pixels near a clipping bound happen to be clipped as
+        # meanclip clips them, so sigma (and the mean) are exact.
+        assert error['nboundary'] == 40
+        assert np.isclose(sigma, exact[1])
+        if return_median:
+            assert abs(val - exact[0]) <= error['median_error']
+        else:
+            assert np.isclose(val, exact[0])
+    assert error['npasses'] <= 5 + 2
+
+
+def test_meanclip_stream_refine_matches_meanclip():
+    data = noisy_data(50000, seed=1)
+    for return_median in (0, 1):
+        exact = meanclip(data, verbose=0, return_median=return_median)
+        val, sigma, error = meanclip_stream(data, verbose=0, 
+            return_median=return_median, nbins=1024, refine=1)
+        assert np.allclose((val, sigma), exact)
+        assert error['median_error'] == 0 and error['nboundary'] == 0
+
+
+def test_meanclip_stream_sources():
+    data = noisy_data((100, 200), seed=2)
+    np.save('test_meanclip_stream.npy', data)
+    try:
+        expected = meanclip_stream(data, verbose=0, refine=1)[:2]
+        sources = ['test_meanclip_stream.npy', 
+            np.load('test_meanclip_stream.npy', mmap_mode='r'),
+            lambda: iter(data), list(data)]
+        for source in sources:
+            assert np.allclose(meanclip_stream(source, verbose=0, refine=1)[:2], 
+                expected)
+    finally:
+        os.remove('test_meanclip_stream.npy')
+    assert_raises(TypeError, meanclip_stream, iter(data))
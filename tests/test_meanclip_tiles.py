@@ -0,0 +1,52 @@
+"""
+Nose tests for tiled sigma clipping, 
+`analysis_tools.statistics.meanclip_tiles`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.statistics.meanclip import meanclip
+from analysis_tools.statistics.meanclip_tiles import meanclip_tiles, expand_tiles
+from clip_data import noisy_data
+
+import numpy as np
+
+
+def test_meanclip_tiles_matches_meanclip_per_tile():
+    image = noisy_data((100, 130))
+    for return_median in (0, 1):
+        val, sigma, count = meanclip_tiles(image, tile=(32, 40), workers=2,
+            verbose=0, return_median=return_median)
+        assert val.shape == sigma.shape == count.shape == (4, 4)
+        for i in range(4):
+            for j in range(4):
+                tile = image[i*32:(i+1)*32, j*40:(j+1)*40]
+                expected = meanclip(tile, verbose=0, return_median=return_median)
+                assert np.allclose((val[i, j], sigma[i, j]), expected)
+                assert count[i, j] == len(meanclip(tile, verbose=0, return_array=1))
+
+
+def test_meanclip_tiles_ignores_nans():
+    image = noisy_data((64, 64), seed=1)
+    masked = image.copy()
+    masked[:10] = np.nan
+    val, sigma, count = meanclip_tiles(masked, tile=(64, 64), verbose=0)
+    assert np.allclose((val[0, 0], sigma[0, 0]), meanclip(image[10:], verbose=0))
+
+
+def test_expand_tiles():
+    tile_map = np.array([[0., 1.], [2., 3.]])
+    full = expand_tiles(tile_map, (20, 15), tile=(10, 10))
+    assert full.shape == (20, 15)
+    # Centers are at rows 4.5 and 14.5 and, the edge tile being on
+    # columns 10 to 14, columns 4.5 and 12.
+    assert full[0, 0] == 0. and full[0, 12] == 1. and full[19, 14] == 3.
+    assert np.isclose(full[9, 4], 0.9)
+    assert np.isclose(full[0, 8], (8 - 4.5) / 7.5)
+    val, sigma, count = meanclip_tiles(noisy_data((20, 15)), tile=(10, 10),
+        verbose=0, interpolate=1)
+    assert val.shape == sigma.shape == (20, 15) and count.shape == (2, 2)
@@ -14,12 +14,20 @@ http://offbytwo.com/2008/05/22/running-nosetests-as-a-git-pre-commit-hook.html
 """
 
 from __future__ import print_function
-from analysis_tools.io.readcol import readcol
+from astropy.io import fits
+from analysis_tools.io.readcol import readcol, readcol_iter, readcol_many
 from analysis_tools.io.writecol import writecol
+from analysis_tools.tables.columntable import ColumnTable
 from nose.tools import *
 from IPython.utils.capture import capture_output
 
+import bz2
+import gzip
+import lzma
+import numpy as np
 import os
+import shutil
+import tempfile
 
 abs_path = os.path.split(os.path.abspath(__file__))[0]
 
@@ -51,3 +59,148 @@ def test_can_read_single_column_file():
 
 def test_can_read_no_header():
     assert readcol(filename=os.path.join(abs_path,'test_files/noheader.txt'), headerstart=0, datastart=0) == (['0', '1'], [['1', '2', '3', '4'], ['.1', '.2', '.3', '.4']])
+
+def test_numpy_engine_returns_typed_columns():
+    header, cols = readcol(filename=os.path.join(abs_path, 'test_files/nominal.txt'), engine='numpy')
+    assert header == ['x', 'y']
+    assert cols[0].dtype.kind == 'i' and list(cols[0]) == [1, 2, 3, 4]
+    assert cols[1].dtype.kind == 'f' and np.allclose(cols[1], [.1, .2, .3, .4])
+
+def test_numpy_engine_takes_dtype_mapping():
+    header, cols = readcol(filename=os.path.join(abs_path,'test_files/noheader.txt'), headerstart=0, datastart=0, engine='numpy', dtype={'0': float, 1: str})
+    assert cols[0].dtype == np.float64
+    assert list(cols[1]) == ['.1', '.2', '.3', '.4']
+
+def test_numpy_engine_keeps_comment_and_delimiter_rules():
+    header, cols = readcol(filename=os.path.join(abs_path, 'test_files/comments_custom2.txt'), comment='%', engine='numpy')
+    assert header == ['x', 'y'] and list(cols[0]) == [1, 2, 3]
+    header, cols = readcol(filename=os.path.join(abs_path, 'test_files/custom_deliminator.txt'), delimiter='|', engine='numpy')
+    assert header == ['x', 'y'] and list(cols[0]) == [1, 2, 3, 4]
+
+def test_iter_yields_fixed_size_chunks():
+    chunks = list(readcol_iter(filename=os.path.join(abs_path, 'test_files/nondefault_start.txt'), chunksize=3, headerstart=4, datastart=6))
+    assert [header for header, cols in chunks] == [['x', 'y'], ['x', 'y']]
+    assert [list(cols[0]) for header, cols in chunks] == [[1, 2, 3], [4]]
+
+def test_iter_yields_nothing_if_no_file():
+    assert list(readcol_iter(filename=os.path.join(abs_path, 'test_files/noexistence.txt'))) == []
+
+def test_cache_returns_memory_mapped_columns():
+    cache_dir = tempfile.mkdtemp()
+    filename = os.path.join(abs_path, 'test_files/nominal.txt')
+    first = readcol(filename=filename, engine='numpy', cache=True, cache_dir=cache_dir)
+    second = readcol(filename=filename, engine='numpy', cache=True, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    assert isinstance(second[1][0], np.memmap)
+    assert second[0] == first[0] and all(np.array_equal(a, b) for a, b in zip(first[1], second[1]))
+    assert readcol(filename=filename, cache=True, cache_dir=cache_dir) == readcol(filename=filename)
+    shutil.rmtree(cache_dir)
+
+def test_many_keeps_order_and_reports_errors():
+    filenames = [os.path.join(abs_path, 'test_files/{}.txt'.format(name)) for name in ['nominal', 'noexistence', 'mixed_space_tab', 'empty']]
+    results, errors = readcol_many(filenames, workers=2)
+    assert results == [readcol(filenames[0]), ([], []), readcol(filenames[2]), ([], [])]
+    assert list(errors.keys()) == [filenames[1], filenames[3]]
+
+def test_many_reports_why_a_file_failed():
+    tmp_dir = tempfile.mkdtemp()
+    filename = os.path.join(tmp_dir, 'short_row.txt')
+    with open(filename, 'w') as f:
+        f.write('x y\n1 .1\n2\n')
+    results, errors = readcol_many([filename], workers=1, engine='numpy')
+    assert results == [([], [])]
+    assert 'fewer than 2 columns' in errors[filename]
+    shutil.rmtree(tmp_dir)
+
+def test_many_concatenates_with_source_column():
+    filenames = [os.path.join(abs_path, 'test_files/{}.txt'.format(name)) for name in ['nominal', 'single_col', 'mixed_space_tab']]
+    header, cols, errors = readcol_many(filenames, workers=1, concatenate=True, engine='numpy')
+    assert header == ['x', 'y', 'source']
+    assert list(cols[0]) == [1, 2, 3, 4, 1, 2, 3, 4]
+    assert list(cols[2]) == [filenames[0]]*4 + [filenames[2]]*4
+    assert list(errors.keys()) == [filenames[1]]
+
+def test_many_does_not_join_mismatched_column_types():
+    tmp_dir = tempfile.mkdtemp()
+    filenames = [os.path.join(tmp_dir, name) for name in ['ints.txt', 'strs.txt']]
+    for filename, text in zip(filenames, ['x\n1\n2\n', 'x\na\nb\n']):
+        with open(filename, 'w') as f:
+            f.write(text)
+    header, cols, errors = readcol_many(filenames, workers=1, concatenate=True, engine='numpy')
+    assert cols[0].dtype.kind == 'i' and list(cols[0]) == [1, 2]
+    assert list(errors.keys()) == [filenames[1]]
+    shutil.rmtree(tmp_dir)
+
+def test_usecols_and_where_select_while_reading():
+    filename = os.path.join(abs_path, 'test_files/nominal.txt')
+    assert readcol(filename=filename, usecols=['y'], where={'x': ('>', 1)}) == (['y'], [['.2', '.3', '.4']])
+    header, cols = readcol(filename=filename, usecols=[1, 'x'], where={'x': [('>', 1), ('!=', '3')]}, engine='numpy')
+    assert header == ['y', 'x']
+    assert np.allclose(cols[0], [.2, .4]) and list(cols[1]) == [2, 4]
+
+def test_usecols_and_where_skip_short_and_placeholder_rows():
+    tmp_dir = tempfile.mkdtemp()
+    filename = os.path.join(tmp_dir, 'placeholders.txt')
+    with open(filename, 'w') as f:
+        f.write('x y z\n1 .1 a\n2 .2\n-- .3 c\nINDEF .4 d\n5 .5 e\n')
+    assert readcol(filename=filename, usecols=['x', 'z']) == (['x', 'z'], [['1', '--', 'INDEF', '5'], ['a', 'c', 'd', 'e']])
+    assert readcol(filename=filename, usecols=['y'], where={'x': ('>', 0)}) == (['y'], [['.1', '.2', '.5']])
+    shutil.rmtree(tmp_dir)
+
+def test_reports_short_rows_that_cannot_make_columns():
+    tmp_dir = tempfile.mkdtemp()
+    filename = os.path.join(tmp_dir, 'short_row.txt')
+    with open(filename, 'w') as f:
+        f.write('x y\n1 .1\n2\n3 .3\n')
+    with capture_output() as captured:
+        assert readcol(filename=filename, engine='numpy') == ([], [])
+    assert 'fewer than 2 columns' in captured.stdout
+    assert_raises(ValueError, list, readcol_iter(filename=filename))
+    with capture_output() as captured:
+        assert len(readcol(filename=filename, return_type=ColumnTable)) == 0
+    assert 'fewer than 2 columns' in captured.stdout
+    results, errors = readcol_many([filename], workers=1, return_type=ColumnTable)
+    assert len(results[0]) == 0 and list(errors.keys()) == [filename]
+    shutil.rmtree(tmp_dir)
+
+def test_reads_compressed_files():
+    tmp_dir = tempfile.mkdtemp()
+    with open(os.path.join(abs_path, 'test_files/nominal.txt'), 'rb') as f:
+        text = f.read()
+    for opener in [gzip.open, bz2.open, lzma.open]:
+        # No telling extension, so the compression must come from the bytes.
+        filename = os.path.join(tmp_dir, 'nominal.dat')
+        with opener(filename, 'wb') as f:
+            f.write(text)
+        assert readcol(filename=filename) == (['x', 'y'], [['1', '2', '3', '4'], ['.1', '.2', '.3', '.4']])
+        assert [list(cols[0]) for header, cols in readcol_iter(filename=filename, chunksize=2)] == [[1, 2], [3, 4]]
+    shutil.rmtree(tmp_dir)
+
+def test_reports_truncated_compressed_file():
+    tmp_dir = tempfile.mkdtemp()
+    filename = os.path.join(tmp_dir, 'truncated.txt.gz')
+    with gzip.open(filename, 'wb') as f:
+        f.write(b'x y\n' + b'1 .1\n' * 10000)
+    with open(filename, 'rb') as f:
+        text = f.read()
+    with open(filename, 'wb') as f:
+        f.write(text[:len(text) // 2])
+    for engine in ['python', 'numpy']:
+        with capture_output() as captured:
+            assert readcol(filename=filename, engine=engine) == ([], [])
+        assert 'Could not decompress' in captured.stdout
+    with capture_output() as captured:
+        assert list(readcol_iter(filename=filename, chunksize=10**6)) == []
+    assert 'Could not decompress' in captured.stdout
+    shutil.rmtree(tmp_dir)
+
+def test_fits_image_without_table_reads_empty():
+    tmp_dir = tempfile.mkdtemp()
+    filename = os.path.join(tmp_dir, 'image.fits')
+    fits.PrimaryHDU(np.zeros((4, 5))).writeto(filename)
+    with capture_output() as captured:
+        assert readcol(filename=filename) == ([], [])
+    assert 'No binary table' in captured.stdout
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(np.zeros((4, 5)))]).writeto(filename, overwrite=True)
+    assert readcol(filename=filename, verbose=False) == ([], [])
+    shutil.rmtree(tmp_dir)
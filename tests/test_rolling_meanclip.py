@@ -0,0 +1,43 @@
+"""
+Nose tests for sigma clipping over moving windows, 
+`analysis_tools.statistics.rolling_meanclip`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.statistics.meanclip import meanclip
+from analysis_tools.statistics.rolling_meanclip import rolling_meanclip
+from clip_data import noisy_data
+from nose.tools import *
+
+import numpy as np
+
+
+def test_rolling_meanclip_matches_meanclip_per_window():
+    data = noisy_data(300)
+    data[100] = -1e6
+    for return_median in (0, 1):
+        val, sigma, nreject = rolling_meanclip(data, 25, verbose=0,
+            return_median=return_median, chunksize=100)
+        assert len(val) == len(sigma) == len(nreject) == 276
+        for i in range(0, 276, 5):
+            window = data[i:i+25]
+            expected = meanclip(window, verbose=0, return_median=return_median)
+            assert np.allclose((val[i], sigma[i]), expected)
+            kept = meanclip(window, verbose=0, return_array=1)
+            assert nreject[i] == 25 - len(kept)
+
+
+def test_rolling_meanclip_ignores_nans():
+    data = noisy_data(60, seed=1)
+    data[10:15] = np.nan
+    val, sigma, nreject = rolling_meanclip(data, 20, verbose=0)
+    window = data[5:25]
+    window = window[~np.isnan(window)]
+    assert np.allclose((val[5], sigma[5]), meanclip(window, verbose=0))
+    assert nreject[5] == len(window) - len(meanclip(window, verbose=0, return_array=1))
+    assert_raises(ValueError, rolling_meanclip, data, 61)
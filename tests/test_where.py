@@ -0,0 +1,100 @@
+"""
+Nose tests for IDL-like where functions, `analysis_tools.where.where`.
+
+Use:
+
+    >>> nosetests
+
+"""
+
+from __future__ import print_function
+from analysis_tools.where.where import andwhere, where_all, where_any
+from analysis_tools.where.where import where_bins, where_windows, where_chunked
+from analysis_tools.where.where import where_table
+from analysis_tools.tables.columntable import ColumnTable
+from astropy.table import Table
+from analysis_tools.where.sorted_index import SortedIndex
+from nose.tools import *
+
+import numpy as np
+import os
+import tempfile
+
+
+data = np.array([5., 1., 4., 2., 3., 2.])
+
+
+def test_andwhere_one_and_two_tests():
+    assert list(andwhere(data, 2, '>')) == [5., 4., 3.]
+    assert list(andwhere(data, 1, '>', 4, '<', return_indices=True)) == [3, 4, 5]
+    assert list(andwhere(data, 2, '==', return_indices=True)) == [3, 5]
+
+def test_where_all_combines_any_number_of_tests():
+    assert list(where_all(data, [('>', 1), ('!=', 3), ('between', (2, 4))], return_indices=True)) == [2, 3, 5]
+    assert list(where_all(data, [])) == list(data)
+    assert_raises(ValueError, where_all, data, [('=>', 1)])
+
+def test_where_any():
+    assert list(where_any(data, [('<', 2), ('between', (4, 4))], return_indices=True)) == [1, 2]
+    assert list(where_any(data, [])) == []
+
+def test_sorted_index_matches_andwhere():
+    data_nan = np.append(data, np.nan)
+    index = SortedIndex(data_nan)
+    for args in [(2, '>'), (2, '>='), (2, '=='), (1, '>', 4, '<'), (2, '<=', 5, '>'), (np.nan, '>')]:
+        assert list(index.andwhere(*args, return_indices=True)) == list(andwhere(data_nan, *args, return_indices=True))
+        assert list(index.andwhere(*args)) == list(andwhere(data_nan, *args))
+    assert list(index.where_all([('between', (2, 4))], ordered=False)) == [2., 2., 3., 4.]
+    assert index.count([('>', 1)]) == 5
+    assert_raises(ValueError, index.where_all, [('!=', 1)])
+
+def test_where_bins_matches_andwhere_per_bin():
+    edges = [1, 2, 3, 5]
+    offsets, indices = where_bins(data, edges)
+    assert list(offsets) == [0, 1, 3, 6]
+    assert list(indices[offsets[0]:offsets[1]]) == list(andwhere(data, 1, '>=', 2, '<', return_indices=True))
+    assert list(indices[offsets[2]:offsets[3]]) == list(andwhere(data, 3, '>=', 5, '<=', return_indices=True))
+    assert list(where_bins(data, [0, 2, 10, 20], return_counts=True)) == [1, 5, 0]
+
+def test_where_windows_overlapping():
+    windows = [(1, 3), (2, 5), (6, 7)]
+    offsets, indices = where_windows(data, windows, closed='both')
+    for w, (low, high) in enumerate(windows):
+        assert list(indices[offsets[w]:offsets[w+1]]) == list(andwhere(data, low, '>=', high, '<=', return_indices=True))
+    assert list(where_windows(SortedIndex(data), windows, closed='neither', return_counts=True)) == [2, 2, 0]
+
+def test_where_chunked_matches_where_all_on_memmap():
+    filename = os.path.join(tempfile.mkdtemp(), 'data.npy')
+    np.save(filename, np.tile(data, 10))
+    tests = [('>', 1), ('!=', 3)]
+    expected = where_all(np.tile(data, 10), tests, return_indices=True)
+    for workers in [None, 3]:
+        assert list(where_chunked(filename, tests, chunksize=7, return_indices=True, workers=workers)) == list(expected)
+    mapped = np.load(filename, mmap_mode='r')
+    assert list(where_chunked(mapped, tests, chunksize=4)) == list(mapped[expected])
+    assert list(where_chunked(mapped, [('<', 2), ('>', 4)], chunksize=4, combine='any')) == list(where_any(mapped, [('<', 2), ('>', 4)]))
+    os.remove(filename)
+
+def test_where_chunked_walks_rows_of_fortran_ordered_memmap():
+    filename = os.path.join(tempfile.mkdtemp(), 'image.npy')
+    image = np.asfortranarray(np.arange(35.).reshape(5, 7) % 6)
+    np.save(filename, image)
+    mapped = np.load(filename, mmap_mode='r')
+    assert not mapped.flags.c_contiguous
+    expected = where_all(image.reshape(-1), [('>', 3)], return_indices=True)
+    for chunksize in [1, 10, 100]:
+        assert list(where_chunked(mapped, [('>', 3)], chunksize=chunksize, return_indices=True)) == list(expected)
+    assert list(where_chunked(mapped, [('>', 3)], chunksize=10, workers=2)) == list(image.reshape(-1)[expected])
+    del mapped
+    os.remove(filename)
+
+def test_where_table_on_every_column_set():
+    spec = {'x': [('>', 1)], 'y': ('<', .4)}
+    tab = Table([[1, 2, 3, 4], [.1, .2, .3, .4]], names=['x', 'y'])
+    assert list(where_table(tab, spec, return_indices=True)) == [1, 2]
+    assert list(where_table(tab, spec)['x']) == [2, 3]
+    assert list(where_table(ColumnTable.from_table(tab), spec)['y']) == [.2, .3]
+    assert list(where_table({'x': [1, 2, 3, 4], 'y': [.1, .2, .3, .4], 'meta': {}}, spec)['x']) == [2, 3]
+    header, cols = where_table((['x', 'y'], [['1', '2', '3', '4'], ['.1', '.2', '.3', '.4']]), spec)
+    assert list(cols[1]) == ['.2', '.3']
+    assert_raises(ValueError, where_table, tab, {'z': ('<', 1)})
@@ -15,10 +15,11 @@ http://offbytwo.com/2008/05/22/running-nosetests-as-a-git-pre-commit-hook.html
 
 from __future__ import print_function
 from analysis_tools.io.readcol import readcol
-from analysis_tools.io.writecol import writecol
+from analysis_tools.io.writecol import writecol, ColumnWriter
 from nose.tools import *
 from IPython.utils.capture import capture_output
 
+import numpy as np
 import os
 
 abs_path = os.path.split(os.path.abspath(__file__))[0]
@@ -98,6 +99,40 @@ def test_exits_gracefully_if_ncols_headerlen_mismatched():
     assert out.split('\n')[1] == "Error: length of header, {}, does not match number of columns, {}."\
         .format(1, 2)
 
+def test_writes_arrays_same_as_lists():
+    filename='test_write_arrays.txt'
+    data = [np.array([1, 2]), np.array([.1, .25], dtype=np.float32), np.array(['a', 'b'])]
+    writecol(filename=filename, data=data, header=['x', 'y', 'z'], delimiter=' | ')
+    with open(filename) as f:
+        assert f.read() == '# x | y | z\n1 | 0.1 | a\n2 | 0.25 | b\n'
+    os.remove(filename)
 
+def test_writes_with_column_formats():
+    filename='test_write_fmt.txt'
+    writecol(filename=filename, data=[np.array([1, 2]), np.array([.1, .25])], header=['x', 'y'], fmt=['%03d', '%.3f'])
+    with open(filename) as f:
+        assert f.read() == '# x y\n001 0.100\n002 0.250\n'
+    os.remove(filename)
 
+def test_column_writer_matches_writecol():
+    filename='test_column_writer.txt'
+    with ColumnWriter(filename, header=['x', 'y'], buffersize=10) as w:
+        w.write_batch([['1', '2'], ['.1', '.2']])
+        w.write_batch([np.array([3, 4]), np.array(['.3', '.4'])])
+    assert w.nrows == 4
+    assert readcol(filename=filename) == (['x', 'y'], [['1', '2', '3', '4'], ['.1', '.2', '.3', '.4']])
+    assert_raises(IOError, ColumnWriter, filename)
+    with ColumnWriter(filename, header=['x', 'y'], writer='w', overwrite=True) as w:
+        assert_raises(ValueError, w.write_batch, [['1']])
+        assert_raises(ValueError, w.write_batch, [['1'], ['.1', '.2']])
+    os.remove(filename)
 
+def test_writes_binary_tables_read_back_memory_mapped():
+    for format in ['npy', 'fits']:
+        filename='test_write_binary.{}'.format(format)
+        writecol(filename=filename, data=[np.array([1, 2]), np.array([.1, .25]), ['a', 'bb']], header=['x', 'y', 'z'], format=format)
+        header, cols = readcol(filename=filename)
+        assert header == ['x', 'y', 'z']
+        assert list(cols[0]) == [1, 2] and list(cols[1]) == [.1, .25] and list(cols[2]) == ['a', 'bb']
+        assert readcol(filename=filename, usecols=['z'], where={'x': ('>', 1)})[1][0].tolist() == ['bb']
+        os.remove(filename)